@@ -0,0 +1,309 @@
+"""
+Times every pipeline stage on synthetic catalogs of increasing size.
+
+Both baseline packages ship their modules as a top-level `src` package, so
+each one is imported here under its own alias (`llm_src`, `nonllm_src`);
+the modules are used unmodified.
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py                          # 10k, 100k, 1M
+    python benchmarks/run_benchmarks.py --sizes 10000 50000 --max-queries 2000
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+
+Results go to benchmarks/results/<commit>-<timestamp>.json. A stage that
+fails (e.g. MemoryError at 1M) is recorded with its error and the run moves
+on to the next size, so the file shows where each stage stops scaling.
+"""
+import argparse
+import datetime
+import gc
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from synthetic import generate_catalog, write_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+SIZES = [10_000, 100_000, 1_000_000]
+DUPLICATE_RATE = 0.5
+DESC_WORDS = 30
+MAX_QUERIES = 10_000   # retrieval / blocking are timed on a query sample and extrapolated
+TOP_K = 50
+SEED = 0
+
+
+# -------------------------------------------------------------------
+# Package aliases
+# -------------------------------------------------------------------
+def alias_package(alias, path):
+    """Registers `path` (a directory of modules) as the package `alias`."""
+    package = types.ModuleType(alias)
+    package.__path__ = [path]
+    package.__package__ = alias
+    sys.modules[alias] = package
+    return package
+
+
+alias_package("llm_src", os.path.join(ROOT, "llm_ER_baselines", "src"))
+alias_package("nonllm_src", os.path.join(ROOT, "non-llm_ER_baselines", "src"))
+
+llm_loader = importlib.import_module("llm_src.loader")
+llm_blocker = importlib.import_module("llm_src.blocker")
+llm_block_index = importlib.import_module("llm_src.block_index")
+llm_retrieval = importlib.import_module("llm_src.retrieval")
+llm_evaluation = importlib.import_module("llm_src.evaluation")
+nonllm_blocker = importlib.import_module("nonllm_src.blocker")
+nonllm_eval = importlib.import_module("nonllm_src.eval")
+nonllm_labels = importlib.import_module("nonllm_src.labels")
+constants = importlib.import_module("llm_src.constants")
+
+
+# -------------------------------------------------------------------
+# Timing
+# -------------------------------------------------------------------
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+class StageTimer:
+    def __init__(self, n_records):
+        self.n_records = n_records
+        self.rows = []
+
+    def run(self, stage, fn, items=None):
+        """
+        Times `fn()`. `items` (or fn's returned item count when `items` is a
+        callable) gives the throughput denominator.
+        """
+        gc.collect()
+        row = {"n_records": self.n_records, "stage": stage}
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:   # incl. MemoryError: record it and keep going
+            row.update(seconds=time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            print(f"  {stage:<18} FAILED {row['error']}")
+            self.rows.append(row)
+            return None
+        seconds = time.perf_counter() - start
+
+        n_items = items(result) if callable(items) else items
+        row.update(seconds=seconds, items=n_items, peak_rss_mb=round(peak_rss_mb(), 1))
+        if n_items:
+            row["items_per_sec"] = n_items / seconds if seconds > 0 else None
+        print(f"  {stage:<18} {seconds:9.3f}s" + (f"  {n_items} items" if n_items else ""))
+        self.rows.append(row)
+        return result
+
+    def extrapolate(self, stage, full_items):
+        """Adds the projected full-size time to a stage timed on a sample."""
+        row = self.rows[-1]
+        if row["stage"] == stage and "error" not in row and row.get("items"):
+            row["extrapolated_seconds"] = row["seconds"] * full_items / row["items"]
+
+
+# -------------------------------------------------------------------
+# One size
+# -------------------------------------------------------------------
+def bench_size(n_records, duplicate_rate, desc_words, max_queries, workdir):
+    print(f"--- {n_records} records ---")
+    timer = StageTimer(n_records)
+    rng = np.random.default_rng(SEED)
+
+    catalog = timer.run(
+        "generate",
+        lambda: generate_catalog(n_records, duplicate_rate, desc_words, seed=SEED),
+        items=2 * n_records
+    )
+    if catalog is None:
+        return timer.rows
+    paths = write_catalog(os.path.join(workdir, str(n_records)), *catalog)
+    gt_df = catalog[2]
+    del catalog
+
+    def load_serialize():
+        amazon_df = llm_loader.load(paths["amazon"])
+        amazon_df["serialized"] = llm_loader.serialize_frame(amazon_df, constants.AMAZON_FIELDS)
+        google_df = llm_loader.load(paths["google"])
+        google_df["serialized"] = llm_loader.serialize_frame(google_df, constants.GOOGLE_FIELDS)
+        return amazon_df, google_df
+
+    frames = timer.run("load_serialize", load_serialize, items=2 * n_records)
+    if frames is None:
+        return timer.rows
+    amazon_df, google_df = frames
+
+    vectorizer = clone(llm_blocker.vectorizer)
+    google_tfidf = timer.run(
+        "tfidf_fit", lambda: vectorizer.fit_transform(google_df["serialized"]),
+        items=n_records
+    )
+    if google_tfidf is None:
+        return timer.rows
+
+    queries = np.sort(rng.choice(n_records, size=min(max_queries, n_records), replace=False))
+    amazon_tfidf = timer.run(
+        "tfidf_transform", lambda: vectorizer.transform(amazon_df["serialized"].iloc[queries]),
+        items=len(queries)
+    )
+    if amazon_tfidf is None:
+        return timer.rows
+
+    top = timer.run(
+        "retrieval", lambda: llm_retrieval.top_k(amazon_tfidf, google_tfidf, TOP_K),
+        items=len(queries)
+    )
+    timer.extrapolate("retrieval", n_records)
+
+    block_index = timer.run(
+        "blocking_build", lambda: llm_block_index.BlockIndex.build(google_df),
+        items=n_records
+    )
+    if block_index is not None:
+        timer.run(
+            "blocking_query", lambda: block_index.query_frame(amazon_df.iloc[queries]),
+            items=len(queries)
+        )
+        timer.extrapolate("blocking_query", n_records)
+    del block_index
+
+    gold_df = timer.run(
+        "gold_sampling",
+        lambda: nonllm_labels.generate_gold_df(gt_df, google_df["id"].tolist()),
+        items=len
+    )
+    if gold_df is not None:
+        pairs_df = gold_df.drop(columns=["label"]).merge(
+            amazon_df[["id", "serialized"]], left_on=constants.AMAZON_ID_COL, right_on="id", how="left"
+        ).drop(columns=["id"]).merge(
+            google_df[["id", "serialized"]], left_on=constants.GOOGLE_ID_COL, right_on="id",
+            suffixes=("_amazon", "_google"), how="left"
+        ).drop(columns=["id"]).fillna({"serialized_amazon": "", "serialized_google": ""})
+
+        scored = timer.run(
+            "nonllm_scoring",
+            lambda: nonllm_blocker.calculate_similiarity(
+                pairs_df, "serialized_amazon", "serialized_google"
+            ),
+            items=len(pairs_df)
+        )
+        if scored is not None:
+            gold_pairs = set(zip(
+                gold_df.loc[gold_df["label"] == 1, constants.AMAZON_ID_COL],
+                gold_df.loc[gold_df["label"] == 1, constants.GOOGLE_ID_COL]
+            ))
+            timer.run(
+                "pr_curve", lambda: nonllm_eval.precision_recall_curve(scored, gold_pairs),
+                items=len(scored)
+            )
+
+    if top is not None:
+        q_idx, g_idx, rank, score = llm_retrieval.flatten_top_k(*top)
+        candidates_df = pd.DataFrame({
+            constants.AMAZON_ID_COL: amazon_df["id"].to_numpy()[queries][q_idx],
+            constants.GOOGLE_ID_COL: google_df["id"].to_numpy()[g_idx],
+            "rank": rank,
+        })
+        sampled_gt = gt_df[gt_df[constants.AMAZON_ID_COL].isin(candidates_df[constants.AMAZON_ID_COL].unique())]
+        recall = timer.run(
+            "recall_at_k",
+            lambda: llm_evaluation.recall_at_k(candidates_df, sampled_gt),
+            items=len(candidates_df)
+        )
+        if recall is not None:
+            timer.rows[-1]["recall"] = {str(k): v for k, v in recall.items()}
+
+    return timer.rows
+
+
+# -------------------------------------------------------------------
+# Reporting
+# -------------------------------------------------------------------
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old_path, new_path):
+    """Prints new/old time ratios for every (size, stage) present in both runs."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    key = lambda r: (r["n_records"], r["stage"])
+    old_rows = {key(r): r for r in old["results"] if "error" not in r}
+
+    print(f"{'records':>10} {'stage':<18} {old['commit']:>10} {new['commit']:>10}  ratio")
+    for row in new["results"]:
+        before = old_rows.get(key(row))
+        if before is None or "error" in row:
+            continue
+        ratio = row["seconds"] / before["seconds"] if before["seconds"] else float("nan")
+        flag = "  <-- slower" if ratio > 1.2 else ""
+        print(f"{row['n_records']:>10} {row['stage']:<18} "
+              f"{before['seconds']:>9.3f}s {row['seconds']:>9.3f}s  {ratio:5.2f}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--duplicate-rate", type=float, default=DUPLICATE_RATE)
+    parser.add_argument("--desc-words", type=int, default=DESC_WORDS)
+    parser.add_argument("--max-queries", type=int, default=MAX_QUERIES)
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<commit>-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    commit = git_commit()
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S")
+    out = args.out or os.path.join(RESULTS_DIR, f"{commit}-{stamp}.json")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="er_bench_") as workdir:
+        for n in args.sizes:
+            results += bench_size(n, args.duplicate_rate, args.desc_words, args.max_queries, workdir)
+
+    report = {
+        "commit": commit,
+        "timestamp": stamp,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__},
+        "config": {
+            "sizes": args.sizes, "duplicate_rate": args.duplicate_rate,
+            "desc_words": args.desc_words, "max_queries": args.max_queries,
+            "top_k": TOP_K, "seed": SEED,
+        },
+        "results": results,
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {out}")
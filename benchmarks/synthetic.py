@@ -0,0 +1,123 @@
+"""
+Synthetic Amazon-Google style product catalogs for scale benchmarks.
+
+Records follow the real CSV schemas (Amazon: id, title, description,
+manufacturer, price; Google: id, name, description, manufacturer, price)
+so they go through the unmodified loaders and serializers.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+SYLLABLES = [
+    "ab", "ac", "ad", "al", "an", "ar", "as", "at", "ba", "be", "bi", "bo",
+    "ca", "ce", "co", "cu", "da", "de", "di", "do", "el", "en", "er", "es",
+    "fa", "fi", "fo", "ga", "ge", "go", "ha", "he", "hi", "ho", "ic", "il",
+    "in", "is", "ka", "ke", "ko", "la", "le", "li", "lo", "ma", "me", "mi",
+    "mo", "na", "ne", "ni", "no", "ol", "on", "or", "pa", "pe", "pi", "po",
+    "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to",
+    "ul", "un", "ur", "va", "ve", "vi", "vo", "xa", "ya", "za", "ze", "zo",
+]
+SUFFIXES = ["", "", "", " inc", " corp", " corporation", " ltd", " llc"]
+
+
+def make_vocabulary(size, rng, min_syllables=2, max_syllables=4):
+    """`size` distinct pseudo-words built from random syllables."""
+    words = set()
+    while len(words) < size:
+        n = size - len(words)
+        lengths = rng.integers(min_syllables, max_syllables + 1, size=n)
+        picks = rng.integers(len(SYLLABLES), size=(n, max_syllables))
+        for row, length in zip(picks, lengths):
+            words.add("".join(SYLLABLES[i] for i in row[:length]))
+    return np.array(sorted(words), dtype=object)
+
+
+def _zipf_draws(rng, vocab_size, shape, exponent=1.1):
+    """Token ids with a Zipf-like frequency profile, as in real text."""
+    weights = 1.0 / np.arange(1, vocab_size + 1) ** exponent
+    return rng.choice(vocab_size, size=shape, p=weights / weights.sum())
+
+
+def _join_rows(vocab, token_ids, lengths):
+    return [" ".join(vocab[row[:n]]) for row, n in zip(token_ids, lengths)]
+
+
+def generate_catalog(n_records, duplicate_rate=0.5, desc_words=30, seed=0,
+                     vocab_size=20_000, n_manufacturers=2_000):
+    """
+    Builds (amazon_df, google_df, gt_df) with `n_records` rows per side.
+
+    duplicate_rate - fraction of Amazon records that have a (noisy) Google
+                     duplicate; the rest of the Google side is unrelated.
+    desc_words     - mean description length in tokens (Poisson).
+    """
+    rng = np.random.default_rng(seed)
+    vocab = make_vocabulary(vocab_size, rng)
+    manufacturers = make_vocabulary(n_manufacturers, rng, 3, 4)
+
+    def records(n, prefix):
+        title_len = rng.integers(3, 8, size=n)
+        titles = _join_rows(vocab, _zipf_draws(rng, vocab_size, (n, 7)), title_len)
+        versions = [f" {a}.{b}" for a, b in zip(rng.integers(1, 20, n), rng.integers(0, 10, n))]
+
+        desc_len = np.minimum(rng.poisson(desc_words, size=n), 4 * desc_words + 1)
+        max_len = int(desc_len.max()) if n else 0
+        descriptions = _join_rows(vocab, _zipf_draws(rng, vocab_size, (n, max_len)), desc_len)
+
+        return pd.DataFrame({
+            "id": [f"{prefix}{i:08d}" for i in range(n)],
+            "title": [t + v for t, v in zip(titles, versions)],
+            "description": descriptions,
+            "manufacturer": manufacturers[rng.integers(n_manufacturers, size=n)],
+            "price": np.round(rng.gamma(2.0, 40.0, size=n), 2),
+        })
+
+    amazon_df = records(n_records, "b")
+    google_df = records(n_records, "http://www.google.com/base/feeds/snippets/")
+
+    # overwrite a random subset of Google rows with noisy copies of Amazon rows
+    n_dup = int(round(n_records * duplicate_rate))
+    src = rng.choice(n_records, size=n_dup, replace=False)
+    dst = rng.choice(n_records, size=n_dup, replace=False)
+
+    dup = amazon_df.iloc[src].reset_index(drop=True)
+    title_tokens = dup["title"].str.split()
+    drop = rng.random(n_dup) < 0.3   # drop one title token
+    dup.loc[drop, "title"] = [
+        " ".join(t[:i] + t[i + 1:]) if len(t) > 1 else " ".join(t)
+        for t, i in zip(title_tokens[drop], rng.integers(0, 7, size=int(drop.sum())))
+    ]
+    desc_tokens = dup["description"].str.split()
+    dup["description"] = [  # Google descriptions are shorter
+        " ".join(t[:max(1, len(t) // 2)]) for t in desc_tokens
+    ]
+    suffixes = np.array(SUFFIXES, dtype=object)[rng.integers(len(SUFFIXES), size=n_dup)]
+    dup["manufacturer"] = dup["manufacturer"] + suffixes
+    dup["price"] = np.round(dup["price"] * rng.uniform(0.9, 1.1, size=n_dup), 2)
+
+    for col in ("title", "description", "manufacturer", "price"):
+        google_df.loc[dst, col] = dup[col].to_numpy()
+
+    google_df = google_df.rename(columns={"title": "name"})
+    gt_df = pd.DataFrame({
+        "idAmazon": amazon_df["id"].to_numpy()[src],
+        "idGoogleBase": google_df["id"].to_numpy()[dst],
+    })
+
+    return amazon_df, google_df, gt_df
+
+
+def write_catalog(root, amazon_df, google_df, gt_df):
+    """Writes the catalog with the file names and encoding of the real dataset."""
+    os.makedirs(root, exist_ok=True)
+    paths = {
+        "amazon": os.path.join(root, "Amazon.csv"),
+        "google": os.path.join(root, "GoogleProducts.csv"),
+        "gt": os.path.join(root, "Amzon_GoogleProducts_perfectMapping.csv"),
+    }
+    amazon_df.to_csv(paths["amazon"], index=False, encoding="latin1")
+    google_df.to_csv(paths["google"], index=False, encoding="latin1")
+    gt_df.to_csv(paths["gt"], index=False)
+    return paths
@@ -1,37 +1,56 @@
 # %%
+import argparse
 import os
 from dotenv import load_dotenv
 load_dotenv()
 import random
 random.seed(42) ### Reproducible
 
+import openai
+from src.checkpoint import Checkpoint
 from src.matcher import llm_match_cached
+from src.response_parsing import VerificationError
 from src.labels import generate_gold_df
-from src.loader import load, serialize_record
+from src.loader import load, serialize_frame
+from src.candidate_store import CandidateStore
+from src.metrics import METRICS, Profiler
 import pandas as pd
 import time
 from src.constants import *
-from openai import OpenAI
 
-# Load the variables from .env
+NEGATIVES = "random"   # or "hard": top-ranked non-matches from ./candidates (run retrieval_blocking.py first)
 
-api_key = os.getenv("OPENAI_API_KEY")
+# completed rows -> <CHECKPOINT_PATH>.results.jsonl, failed pairs ->
+# <CHECKPOINT_PATH>.dead.jsonl; --resume skips rows completed by an earlier run
+CHECKPOINT_PATH = "checkpoints/direct"
 
-client = OpenAI(api_key=api_key) 
+METRICS_PATH = "metrics/direct"   # writes .json and .prom at the end of the run
+PROFILE_CPU = False               # cProfile -> metrics/direct.prof
+PROFILE_MEMORY = False            # tracemalloc -> metrics/direct.mem.txt
 
+parser = argparse.ArgumentParser(description="LLM verification of the gold pairs")
+parser.add_argument("--resume", action="store_true", help="skip pairs completed by an interrupted run")
+args = parser.parse_args()
+
+checkpoint = Checkpoint(CHECKPOINT_PATH, resume=args.resume)
+
+profiler = Profiler(cpu=PROFILE_CPU, memory=PROFILE_MEMORY, metrics=METRICS).start()
 start = time.perf_counter()
 # %%
 #### Loading data
 amazon_df = load(AMAZON_PATH)
-amazon_df["serialized"] = amazon_df.apply(lambda r: serialize_record(r, AMAZON_FIELDS), axis= 1)
+amazon_df["serialized"] = serialize_frame(amazon_df, AMAZON_FIELDS)
 
 google_df = load(GOOGLE_PATH)
-google_df["serialized"] = google_df.apply(lambda r: serialize_record(r, GOOGLE_FIELDS), axis= 1)
+google_df["serialized"] = serialize_frame(google_df, GOOGLE_FIELDS)
 
 gt_df = pd.read_csv(GT_PATH)
 
 ### Generate gold dataframe
-gold_df = generate_gold_df(gt_df, all_google_ids=google_df["id"].tolist())
+candidates_df = CandidateStore("candidates").frame() if NEGATIVES == "hard" else None
+gold_df = generate_gold_df(
+    gt_df, all_google_ids=google_df["id"].tolist(), candidates_df=candidates_df
+)
 ### Report class balance
 print("------------- Class balance -------------")
 class_balance = gold_df["label"].value_counts()
@@ -62,36 +81,52 @@ pairs_df = pairs_df.merge(
 pairs_df['serialized_amazon'] = pairs_df['serialized_amazon'].fillna('')
 pairs_df['serialized_google'] = pairs_df['serialized_google'].fillna('')
 
-end = time.perf_counter()
-total_time = end - start
-num_pairs = len(pairs_df)
-
-avg_latency = total_time / num_pairs
-throughput = num_pairs / total_time
+METRICS.observe("stage_seconds", time.perf_counter() - start, stage="prepare")
 # %%
 candidates = pairs_df
 print(len(candidates))
 
 results = []
 
-for _, row in candidates.iterrows():
-    output = llm_match_cached(
-        row[AMAZON_ID_COL],
-        row[GOOGLE_ID_COL],
-        row["serialized_amazon"],
-        row["serialized_google"]
-    )
-
-    results.append({
-        AMAZON_ID_COL: row[AMAZON_ID_COL],
-        GOOGLE_ID_COL: row[GOOGLE_ID_COL],
-        "pred_label": 1 if output["label"] == "match" else 0,
-        "confidence": output["confidence"],
-        "latency": output["latency"],
-        "tokens": output["tokens"]
-    })
-
-llm_df = pd.DataFrame(results)
+with METRICS.span("verify"):
+    for _, row in candidates.iterrows():
+        key = f"{row[AMAZON_ID_COL]}||{row[GOOGLE_ID_COL]}"
+        if key in checkpoint:
+            results.append(checkpoint.get(key))
+            continue
+
+        try:
+            output = llm_match_cached(
+                row[AMAZON_ID_COL],
+                row[GOOGLE_ID_COL],
+                row["serialized_amazon"],
+                row["serialized_google"]
+            )
+        except (VerificationError, openai.APIError) as e:
+            # dead-lettered pairs are left out of llm_df, i.e. predicted non-matches
+            checkpoint.dead_letter(
+                key, e,
+                amazon_id=row[AMAZON_ID_COL], google_id=row[GOOGLE_ID_COL]
+            )
+            continue
+
+        result = {
+            AMAZON_ID_COL: row[AMAZON_ID_COL],
+            GOOGLE_ID_COL: row[GOOGLE_ID_COL],
+            "pred_label": 1 if output["label"] == "match" else 0,
+            "confidence": output["confidence"],
+            "latency": output["latency"],
+            "tokens": output["tokens"]
+        }
+        checkpoint.append(key, result)
+        results.append(result)
+
+checkpoint.close()
+print(f"Resumed {checkpoint.resumed} pairs, {checkpoint.failed} failed (see {checkpoint.dead_path})")
+
+llm_df = pd.DataFrame(results, columns=[
+    AMAZON_ID_COL, GOOGLE_ID_COL, "pred_label", "confidence", "latency", "tokens"
+])
 
 
 ### Evaluation
@@ -119,19 +154,29 @@ recall = TP / (TP + FN)
 f1 = 2 * precision * recall / (precision + recall)
 
 ### Runtime + cost metrics
-avg_latency = llm_df["latency"].mean()
-throughput = 1 / avg_latency
-total_calls = len(llm_df)
-total_tokens = llm_df["tokens"].sum()
+# latency percentiles cover live calls only; cached verdicts carry the
+# latency of the run that produced them
+latency = METRICS.summary("llm_request_seconds", mode="direct")
+prompt_tokens = METRICS.count("llm_prompt_tokens_total", mode="direct")
+completion_tokens = METRICS.count("llm_completion_tokens_total", mode="direct")
 
 summary = pd.DataFrame([{
     "precision": precision,
     "recall": recall,
     "f1": f1,
-    "avg_latency_sec": avg_latency,
-    "throughput_pairs_per_sec": throughput,
-    "llm_calls": total_calls,
-    "total_tokens": total_tokens
+    "avg_latency_sec": latency.get("mean", 0.0),
+    "p50_latency_sec": latency.get("p50", 0.0),
+    "p95_latency_sec": latency.get("p95", 0.0),
+    "p99_latency_sec": latency.get("p99", 0.0),
+    "throughput_pairs_per_sec": len(llm_df) / METRICS.stage_seconds("verify"),
+    "llm_calls": METRICS.count("llm_calls_total", mode="direct"),
+    "cache_hits": METRICS.count("llm_cache_hits_total"),
+    "prompt_tokens": prompt_tokens,
+    "completion_tokens": completion_tokens,
+    "total_tokens": prompt_tokens + completion_tokens
 }])
 
-print(summary)
\ No newline at end of file
+print(summary.T)
+
+profiler.stop(METRICS_PATH)
+METRICS.export(METRICS_PATH)
\ No newline at end of file
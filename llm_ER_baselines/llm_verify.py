@@ -2,28 +2,34 @@ import os
 import json
 import hashlib
 import time
+from concurrent.futures import ThreadPoolExecutor
+import openai
 from dotenv import load_dotenv
-from openai import OpenAI
-from src.constants import PROMPT_TEMPLATE
+from src.batch import COMPLETED, FAILED, BatchJobFailed
+from src.cache import SQLiteCache
+from src.constants import PROMPT_TEMPLATE, LISTWISE_PROMPT_TEMPLATE
+from src.llm_client import get_client
+from src.metrics import METRICS
+from src.rate_limit import RateLimiter, backoff_delay, estimate_tokens
+from src.response_parsing import STRICT_SUFFIX, VerificationError, parse_json
 
 # ----------------------------------
 # Setup
 # ----------------------------------
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 MODEL_NAME = "gpt-4o-mini"
+MAX_RETRIES = 5
+PARSE_RETRIES = 2   # re-requests, with a stricter instruction, after an unusable response
+COMPLETION_TOKENS_ESTIMATE = 120   # used for TPM admission before usage is known
 
 # ----------------------------------
 # Cache setup
 # ----------------------------------
-CACHE_PATH = "llm_cache.json"
+CACHE_PATH = "llm_cache.sqlite"
+LEGACY_CACHE_PATH = "llm_cache.json"   # imported into the database on first run
 
-if os.path.exists(CACHE_PATH):
-    with open(CACHE_PATH, "r", encoding="utf-8") as f:
-        CACHE = json.load(f)
-else:
-    CACHE = {}
+CACHE = SQLiteCache(CACHE_PATH, legacy_json=LEGACY_CACHE_PATH)
 
 
 def _cache_key(amazon_record: str, google_record: str) -> str:
@@ -32,15 +38,119 @@ def _cache_key(amazon_record: str, google_record: str) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def _save_cache():
-    with open(CACHE_PATH, "w", encoding="utf-8") as f:
-        json.dump(CACHE, f, indent=2)
+# ----------------------------------
+# Retries
+# ----------------------------------
+def _is_retryable(err: Exception) -> bool:
+    if isinstance(err, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(err, openai.APIStatusError) and err.status_code >= 500
+
+
+def _retry_after(err: Exception):
+    response = getattr(err, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_usage(prompt_tokens: int, completion_tokens: int, mode: str):
+    METRICS.inc("llm_calls_total", mode=mode)
+    METRICS.inc("llm_prompt_tokens_total", prompt_tokens, mode=mode)
+    METRICS.inc("llm_completion_tokens_total", completion_tokens, mode=mode)
+
+
+def _create_completion(prompt: str, limiter: RateLimiter = None, mode: str = "pairwise"):
+    """Chat completion with exponential backoff on 429 / 5xx / connection errors."""
+    estimated = estimate_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE
+
+    for attempt in range(MAX_RETRIES + 1):
+        if limiter is not None:
+            start = time.perf_counter()
+            limiter.acquire(estimated)
+            METRICS.observe("llm_throttle_seconds", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            # retries are handled here so that they go through the rate limiter
+            response = get_client(max_retries=0).chat.completions.create(
+                model=MODEL_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0
+            )
+        except openai.APIError as e:
+            METRICS.inc("llm_errors_total", status=getattr(e, "status_code", None) or type(e).__name__)
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            METRICS.inc("llm_retries_total")
+            time.sleep(backoff_delay(attempt, retry_after=_retry_after(e)))
+            continue
+
+        # one observation per successful request, excluding throttling/backoff
+        METRICS.observe("llm_request_seconds", time.perf_counter() - start, mode=mode)
+        _record_usage(response.usage.prompt_tokens, response.usage.completion_tokens, mode)
+
+        if limiter is not None:
+            limiter.settle(estimated, response.usage.total_tokens)
+        return response
+
+
+def _validate_verdict(parsed: dict):
+    label = parsed.get("label")
+    evidence = parsed.get("evidence", [])
+
+    if label not in {"match", "no_match"}:
+        raise VerificationError(f"Invalid label: {label}")
+    try:
+        confidence = float(parsed.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        raise VerificationError(f"Invalid confidence: {parsed.get('confidence')}")
+
+    return label, confidence, evidence
+
+
+def _complete_parsed(prompt: str, parse, limiter: RateLimiter = None, mode: str = "pairwise"):
+    """
+    Requests `prompt` and applies `parse` to the response text. An unusable
+    response is re-requested up to PARSE_RETRIES times with STRICT_SUFFIX
+    appended; the last VerificationError (with the raw text) is raised.
+
+    Returns (parsed, response).
+    """
+    for attempt in range(PARSE_RETRIES + 1):
+        response = _create_completion(
+            prompt if attempt == 0 else prompt + STRICT_SUFFIX, limiter, mode=mode
+        )
+        content = response.choices[0].message.content.strip()
+        try:
+            return parse(content), response
+        except VerificationError as e:
+            METRICS.inc("llm_parse_failures_total", mode=mode)
+            if e.raw is None:
+                e.raw = content
+            if attempt == PARSE_RETRIES:
+                raise
+
+
+def estimate_cost(pair) -> tuple:
+    """(calls, tokens) a pairwise verification of `pair` would spend; cached pairs are free."""
+    amazon_record, google_record = pair
+    if _cache_key(amazon_record, google_record) in CACHE:
+        return 0, 0
+    prompt = PROMPT_TEMPLATE.format(
+        amazon_record=amazon_record,
+        google_record=google_record
+    )
+    return 1, estimate_tokens(prompt) + COMPLETION_TOKENS_ESTIMATE
 
 
 # ----------------------------------
 # LLM call (with cache)
 # ----------------------------------
-def call_llm(amazon_record: str, google_record: str) -> dict:
+def call_llm(amazon_record: str, google_record: str, limiter: RateLimiter = None) -> dict:
     """
     Calls the LLM to verify whether two product records match.
 
@@ -57,8 +167,11 @@ def call_llm(amazon_record: str, google_record: str) -> dict:
     key = _cache_key(amazon_record, google_record)
 
     # -------- 1. CACHE HIT --------
-    if key in CACHE:
-        return CACHE[key]
+    cached = CACHE.get(key)
+    if cached is not None:
+        METRICS.inc("llm_cache_hits_total")
+        return cached
+    METRICS.inc("llm_cache_misses_total")
 
     # -------- 2. LLM CALL --------
     prompt = PROMPT_TEMPLATE.format(
@@ -68,30 +181,12 @@ def call_llm(amazon_record: str, google_record: str) -> dict:
 
     start = time.perf_counter()
 
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
+    # -------- 3. PARSE + VALIDATION (bounded re-requests) --------
+    (label, confidence, evidence), response = _complete_parsed(
+        prompt, lambda content: _validate_verdict(parse_json(content)), limiter
     )
 
     latency = time.perf_counter() - start
-    content = response.choices[0].message.content.strip()
-
-    # -------- 3. HARD JSON PARSE --------
-    try:
-        parsed = json.loads(content)
-    except json.JSONDecodeError as e:
-        raise RuntimeError(
-            f"LLM returned invalid JSON:\n{content}"
-        ) from e
-
-    # -------- 4. VALIDATION --------
-    label = parsed.get("label")
-    confidence = float(parsed.get("confidence", 0.0))
-    evidence = parsed.get("evidence", [])
-
-    if label not in {"match", "no_match"}:
-        raise ValueError(f"Invalid label: {label}")
 
     result = {
         "label": label,
@@ -101,8 +196,324 @@ def call_llm(amazon_record: str, google_record: str) -> dict:
         "latency": latency
     }
 
-    # -------- 5. SAVE TO CACHE --------
+    # -------- 4. SAVE TO CACHE --------
     CACHE[key] = result
-    _save_cache()
 
     return result
+
+
+# ----------------------------------
+# Listwise LLM call (with per-pair cache)
+# ----------------------------------
+def call_llm_listwise(amazon_record: str, google_records: list, limiter: RateLimiter = None) -> list:
+    """
+    Verifies one Amazon record against several Google candidates in a
+    single request.
+
+    Returns one result per Google record, in the same schema as `call_llm`.
+    Cached pairs are served from the cache and left out of the prompt; the
+    call's tokens are split evenly over the candidates it covered.
+    """
+    keys = [_cache_key(amazon_record, g) for g in google_records]
+    results = [CACHE.get(key) for key in keys]
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    METRICS.inc("llm_cache_hits_total", len(results) - len(missing))
+    METRICS.inc("llm_cache_misses_total", len(missing))
+    if not missing:
+        return results
+
+    google_candidates = "\n\n".join(
+        f"[{n}]\n{google_records[i]}" for n, i in enumerate(missing, start=1)
+    )
+    prompt = LISTWISE_PROMPT_TEMPLATE.format(
+        amazon_record=amazon_record,
+        google_candidates=google_candidates
+    )
+
+    def parse(content):
+        verdicts = {}
+        for item in parse_json(content).get("results", []):
+            try:
+                index = int(item.get("index", 0))
+            except (AttributeError, TypeError, ValueError):
+                raise VerificationError(f"Invalid listwise item: {item}")
+            verdicts[index] = _validate_verdict(item)
+
+        if set(verdicts) != set(range(1, len(missing) + 1)):
+            raise VerificationError(
+                f"Listwise response covers {sorted(verdicts)}, expected 1..{len(missing)}"
+            )
+        return verdicts
+
+    start = time.perf_counter()
+    verdicts, response = _complete_parsed(prompt, parse, limiter, mode="listwise")
+    latency = time.perf_counter() - start
+
+    tokens, extra = divmod(response.usage.total_tokens, len(missing))
+
+    new_entries = []
+    for n, i in enumerate(missing, start=1):
+        label, confidence, evidence = verdicts[n]
+        results[i] = {
+            "label": label,
+            "confidence": confidence,
+            "evidence": evidence,
+            "tokens": tokens + (1 if n <= extra else 0),
+            "latency": latency
+        }
+        new_entries.append((keys[i], results[i]))
+
+    CACHE.set_many(new_entries)
+
+    return results
+
+
+# ----------------------------------
+# Checkpointed verification
+# ----------------------------------
+FAILURES = (VerificationError, openai.APIError)   # what a checkpointed run dead-letters
+
+
+def verify_pair(amazon_record: str, google_record: str, limiter: RateLimiter = None, checkpoint=None):
+    """
+    `call_llm` with an optional `Checkpoint`: completed pairs are served
+    from it / appended to it, and a pair that still fails after retries is
+    dead-lettered and returns None instead of stopping the run.
+    """
+    if checkpoint is None:
+        return call_llm(amazon_record, google_record, limiter=limiter)
+
+    key = _cache_key(amazon_record, google_record)
+    done = checkpoint.get(key)
+    if done is not None:
+        METRICS.inc("checkpoint_hits_total")
+        return done
+
+    try:
+        result = call_llm(amazon_record, google_record, limiter=limiter)
+    except FAILURES as e:
+        METRICS.inc("llm_dead_letters_total", mode="pairwise")
+        checkpoint.dead_letter(key, e, amazon_record=amazon_record, google_record=google_record)
+        return None
+
+    checkpoint.append(key, result)
+    return result
+
+
+# ----------------------------------
+# Concurrent verification
+# ----------------------------------
+def verify_pairs_concurrent(pairs, max_workers: int = 8, rpm: int = None, tpm: int = None,
+                            checkpoint=None) -> list:
+    """
+    Verifies (amazon_record, google_record) pairs on a bounded thread pool.
+
+    At most `max_workers` requests are in flight, admission is throttled by
+    the optional requests/tokens-per-minute limits, and results are returned
+    in the order of `pairs` regardless of completion order. With a
+    `checkpoint`, failed pairs come back as None (see `verify_pair`).
+    """
+    limiter = RateLimiter(rpm, tpm) if (rpm or tpm) else None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(
+            lambda pair: verify_pair(pair[0], pair[1], limiter=limiter, checkpoint=checkpoint),
+            pairs
+        ))
+
+
+def verify_listwise(pairs, batch_size: int = 10, max_workers: int = 8, rpm: int = None, tpm: int = None,
+                    checkpoint=None) -> list:
+    """
+    Listwise counterpart of `verify_pairs_concurrent`.
+
+    Pairs are grouped by Amazon record and each group is sent in batches of
+    up to `batch_size` candidates. Results are returned in the order of
+    `pairs`. With a `checkpoint`, completed pairs are skipped and every pair
+    of a batch that still fails after retries is dead-lettered as None.
+    """
+    limiter = RateLimiter(rpm, tpm) if (rpm or tpm) else None
+    outputs = [None] * len(pairs)
+    keys = [_cache_key(a, g) for a, g in pairs] if checkpoint is not None else None
+
+    positions_by_amazon = {}
+    for pos, (amazon_record, _) in enumerate(pairs):
+        if checkpoint is not None and keys[pos] in checkpoint:
+            METRICS.inc("checkpoint_hits_total")
+            outputs[pos] = checkpoint.get(keys[pos])
+            continue
+        positions_by_amazon.setdefault(amazon_record, []).append(pos)
+
+    batches = []
+    for amazon_record, positions in positions_by_amazon.items():
+        for s in range(0, len(positions), batch_size):
+            batches.append((amazon_record, positions[s:s + batch_size]))
+
+    def run(batch):
+        amazon_record, positions = batch
+        google_records = [pairs[p][1] for p in positions]
+        if checkpoint is None:
+            return call_llm_listwise(amazon_record, google_records, limiter=limiter)
+
+        try:
+            results = call_llm_listwise(amazon_record, google_records, limiter=limiter)
+        except FAILURES as e:
+            METRICS.inc("llm_dead_letters_total", len(positions), mode="listwise")
+            for p in positions:
+                checkpoint.dead_letter(keys[p], e, amazon_record=amazon_record, google_record=pairs[p][1])
+            return [None] * len(positions)
+
+        for p, result in zip(positions, results):
+            checkpoint.append(keys[p], result)
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for (_, positions), batch_results in zip(batches, pool.map(run, batches)):
+            for pos, result in zip(positions, batch_results):
+                outputs[pos] = result
+
+    return outputs
+
+
+# ----------------------------------
+# Offline batch jobs
+# ----------------------------------
+def write_batch_file(pairs, path: str) -> int:
+    """
+    Writes one chat-completion request per uncached, distinct pair to a
+    JSONL job file. The cache key is used as custom_id.
+
+    Returns the number of requests written.
+    """
+    seen = set()
+
+    with open(path, "w", encoding="utf-8") as f:
+        for amazon_record, google_record in pairs:
+            key = _cache_key(amazon_record, google_record)
+            if key in seen:
+                continue
+            if key in CACHE:
+                METRICS.inc("llm_cache_hits_total")
+                continue
+            METRICS.inc("llm_cache_misses_total")
+            seen.add(key)
+
+            prompt = PROMPT_TEMPLATE.format(
+                amazon_record=amazon_record,
+                google_record=google_record
+            )
+            f.write(json.dumps({
+                "custom_id": key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL_NAME,
+                    "messages": [{"role": "user", "content": prompt}],
+                    "temperature": 0
+                }
+            }) + "\n")
+
+    return len(seen)
+
+
+def merge_batch_results(output_path: str):
+    """
+    Validates a batch output file and merges the verdicts into the cache.
+
+    Returns (merged, failed) where `failed` maps custom_id (or "line N" if
+    the line has none) to the reason the line was rejected.
+    """
+    entries = []
+    failed = {}
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+
+            # a malformed line is recorded and skipped, so the verdicts
+            # already parsed from the (paid) output still reach the cache
+            key = f"line {line_no}"
+            try:
+                record = json.loads(line)
+                key = record.get("custom_id") or key
+                response = record.get("response") or {}
+
+                if response.get("status_code") != 200:
+                    failed[key] = f"status {response.get('status_code')}: {record.get('error')}"
+                    continue
+
+                body = response["body"]
+                content = body["choices"][0]["message"]["content"].strip()
+                usage = body["usage"]
+                total_tokens = usage["total_tokens"]
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError, AttributeError) as e:
+                failed[key] = f"malformed output line: {type(e).__name__}: {e}"
+                continue
+
+            try:
+                label, confidence, evidence = _validate_verdict(parse_json(content))
+            except VerificationError as e:
+                failed[key] = f"{e}: {content}"
+                continue
+
+            _record_usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0), "batch")
+            entries.append((key, {
+                "label": label,
+                "confidence": confidence,
+                "evidence": evidence,
+                "tokens": total_tokens,
+                "latency": 0.0   # not observable for batch jobs
+            }))
+
+    CACHE.set_many(entries)
+
+    return len(entries), failed
+
+
+def run_batch(pairs, batch_client, job_path: str, poll_interval: float = 60.0) -> list:
+    """
+    Verifies `pairs` through an offline batch job.
+
+    Uncached prompts are written to `job_path`, submitted through
+    `batch_client`, polled every `poll_interval` seconds and merged into
+    the cache. The job id is kept next to the job file, so re-running after
+    an interruption resumes polling instead of resubmitting.
+
+    Returns cached results aligned with `pairs`; pairs whose request failed
+    or was rejected inside a completed job are None. Raises BatchJobFailed
+    if the job as a whole failed, rather than leaving every pair to the
+    caller's fallback.
+    """
+    id_path = job_path + ".job_id"
+
+    if os.path.exists(id_path):
+        with open(id_path, "r", encoding="utf-8") as f:
+            job_id = f.read().strip()
+    elif write_batch_file(pairs, job_path) > 0:
+        job_id = batch_client.submit(job_path)
+        with open(id_path, "w", encoding="utf-8") as f:
+            f.write(job_id)
+    else:
+        job_id = None
+
+    if job_id is not None:
+        state = batch_client.status(job_id)
+        while state not in {COMPLETED, FAILED}:
+            time.sleep(poll_interval)
+            state = batch_client.status(job_id)
+
+        if state == FAILED:
+            os.remove(id_path)   # the next run submits a new job
+            raise BatchJobFailed(f"Batch job {job_id} failed")
+
+        output_path = job_path + ".out"
+        batch_client.download(job_id, output_path)
+        _, failed = merge_batch_results(output_path)
+        if failed:
+            print(f"Batch job {job_id}: {len(failed)} responses rejected")
+
+        os.remove(id_path)
+
+    return [CACHE.get(_cache_key(a, g)) for a, g in pairs]
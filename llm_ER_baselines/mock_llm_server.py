@@ -0,0 +1,286 @@
+"""
+Local OpenAI-compatible stand-in for load-testing the verification path.
+
+Serves POST /v1/chat/completions for the pairwise and listwise prompts.
+Verdicts are deterministic: a pair is a "match" iff it is in the ground
+truth (records are recognised by their serialized text); pairs it cannot
+map back to ids fall back to token overlap. Latency, 5xx errors and 429s
+are injected from a seeded RNG, and server-side RPM / TPM limits answer
+429 with Retry-After like the real API. Usage is reported per response,
+and totals are served as JSON on GET /stats and Prometheus text on
+GET /metrics.
+
+Usage:
+    python mock_llm_server.py --port 8000 --latency lognormal:0.6,0.4 --rate-limit-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python run_verification.py
+"""
+import argparse
+import collections
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from src.batch import overlap_responder
+from src.constants import *
+from src.loader import load, serialize_frame
+from src.metrics import Metrics
+from src.rate_limit import estimate_tokens
+
+_PAIRWISE_RE = re.compile(
+    r"Amazon product:\s*(.*?)\s*Google product:\s*(.*?)\s*Rules:", re.DOTALL
+)
+_LISTWISE_RE = re.compile(
+    r"Amazon product:\s*(.*?)\s*Google candidates:\s*(.*?)\s*Rules:", re.DOTALL
+)
+_CANDIDATE_RE = re.compile(r"^\[(\d+)\]\n", re.MULTILINE)
+
+
+# -------------------------------------------------------------------
+# Verdicts
+# -------------------------------------------------------------------
+class GroundTruthResponder:
+    """Maps serialized records back to ids and labels pairs from the gold set."""
+
+    def __init__(self, amazon_path=AMAZON_PATH, google_path=GOOGLE_PATH, gt_path=GT_PATH,
+                 confidence=0.95):
+        self.confidence = confidence
+        self.amazon_ids = self._index(load(amazon_path), AMAZON_FIELDS)
+        self.google_ids = self._index(load(google_path), GOOGLE_FIELDS)
+
+        gt_df = pd.read_csv(gt_path)
+        self.gold = set(zip(gt_df[AMAZON_ID_COL], gt_df[GOOGLE_ID_COL]))
+
+    @staticmethod
+    def _index(df, fields):
+        """serialized text -> ids (several records can serialize identically)."""
+        index = collections.defaultdict(list)
+        for record_id, text in zip(df["id"], serialize_frame(df, fields)):
+            index[text.strip()].append(record_id)
+        return index
+
+    def verdict(self, amazon_text, google_text) -> dict:
+        amazon_ids = self.amazon_ids.get(amazon_text.strip())
+        google_ids = self.google_ids.get(google_text.strip())
+
+        if not amazon_ids or not google_ids:
+            body = {"messages": [{"content": PROMPT_TEMPLATE.format(
+                amazon_record=amazon_text, google_record=google_text
+            )}]}
+            return json.loads(overlap_responder(body))
+
+        match = any((a, g) in self.gold for a in amazon_ids for g in google_ids)
+        return {
+            "label": "match" if match else "no_match",
+            "confidence": self.confidence,
+            "evidence": ["ground truth"]
+        }
+
+    def respond(self, prompt) -> str:
+        listwise = _LISTWISE_RE.search(prompt)
+        if listwise:
+            amazon_text, candidates = listwise.groups()
+            parts = _CANDIDATE_RE.split(candidates)[1:]   # [n1, text1, n2, text2, ...]
+            results = [
+                {"index": int(n), **self.verdict(amazon_text, text)}
+                for n, text in zip(parts[0::2], parts[1::2])
+            ]
+            return json.dumps({"results": results})
+
+        pairwise = _PAIRWISE_RE.search(prompt)
+        if pairwise:
+            return json.dumps(self.verdict(*pairwise.groups()))
+
+        return json.dumps({"label": "no_match", "confidence": 0.5, "evidence": ["unrecognised prompt"]})
+
+
+# -------------------------------------------------------------------
+# Latency / faults / limits
+# -------------------------------------------------------------------
+def parse_latency(spec):
+    """
+    "fixed:S" | "uniform:LO,HI" | "normal:MEAN,STD" | "lognormal:MEDIAN,SIGMA"
+    (seconds) -> sampler(rng) -> seconds.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class WindowLimiter:
+    """Non-blocking one-minute sliding window over requests and tokens."""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.events = collections.deque()   # (time, tokens)
+        self.tokens = 0
+        self.lock = threading.Lock()
+
+    def admit(self, tokens):
+        """Returns None if admitted, else the seconds to wait (Retry-After)."""
+        if not self.rpm and not self.tpm:
+            return None
+
+        with self.lock:
+            now = time.monotonic()
+            while self.events and now - self.events[0][0] >= 60.0:
+                self.tokens -= self.events.popleft()[1]
+
+            over_rpm = self.rpm and len(self.events) >= self.rpm
+            over_tpm = self.tpm and self.events and self.tokens + tokens > self.tpm
+            if over_rpm or over_tpm:
+                return max(0.0, 60.0 - (now - self.events[0][0]))
+
+            self.events.append((now, tokens))
+            self.tokens += tokens
+            return None
+
+
+class MockLLM:
+    def __init__(self, responder, latency="fixed:0", error_rate=0.0, rate_limit_rate=0.0,
+                 rpm=None, tpm=None, model="gpt-4o-mini", seed=42):
+        self.responder = responder
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.limiter = WindowLimiter(rpm, tpm)
+        self.model = model
+        self.metrics = Metrics()
+
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+    def _draw(self):
+        with self.rng_lock:
+            return self.latency(self.rng), self.rng.random(), self.rng.random()
+
+    def complete(self, body):
+        """Returns (status, headers, payload) for one chat-completion request."""
+        prompt = body["messages"][-1]["content"]
+        prompt_tokens = estimate_tokens(prompt)
+        delay, fault, throttle = self._draw()
+
+        wait = self.limiter.admit(prompt_tokens)
+        if wait is None and throttle < self.rate_limit_rate:
+            wait = 1.0
+        if wait is not None:
+            self.metrics.inc("mock_requests_total", status=429)
+            return 429, {"retry-after": f"{wait:.2f}"}, _error("Rate limit reached", "rate_limit_exceeded")
+
+        time.sleep(delay)
+        self.metrics.observe("mock_latency_seconds", delay)
+
+        if fault < self.error_rate:
+            self.metrics.inc("mock_requests_total", status=500)
+            return 500, {}, _error("Injected server error", "server_error")
+
+        content = self.responder.respond(prompt)
+        completion_tokens = estimate_tokens(content)
+
+        self.metrics.inc("mock_requests_total", status=200)
+        self.metrics.inc("mock_prompt_tokens_total", prompt_tokens)
+        self.metrics.inc("mock_completion_tokens_total", completion_tokens)
+
+        return 200, {}, {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.model),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+
+def _error(message, code):
+    return {"error": {"message": message, "type": code, "code": code}}
+
+
+# -------------------------------------------------------------------
+# HTTP front-end
+# -------------------------------------------------------------------
+def serve(mock, port):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, as the SDK's connection pool expects
+
+        def _send(self, status, payload, headers=None, content_type="application/json"):
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._send(404, _error(f"No route {self.path}", "not_found"))
+                return
+            try:
+                status, headers, payload = mock.complete(json.loads(body))
+            except (ValueError, KeyError, IndexError) as e:
+                status, headers, payload = 400, {}, _error(f"{type(e).__name__}: {e}", "invalid_request_error")
+            self._send(status, payload, headers)
+
+        def do_GET(self):
+            if self.path == "/v1/models":
+                self._send(200, {"object": "list", "data": [{"id": mock.model, "object": "model"}]})
+            elif self.path == "/stats":
+                self._send(200, mock.metrics.to_dict())
+            elif self.path == "/metrics":
+                self._send(200, mock.metrics.to_prometheus().encode("utf-8"),
+                           content_type="text/plain; version=0.0.4")
+            else:
+                self._send(404, _error(f"No route {self.path}", "not_found"))
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    print(f"Mock LLM on http://127.0.0.1:{port}/v1", file=sys.stderr)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:0", help='e.g. "fixed:0.2", "uniform:0.1,0.8", "lognormal:0.6,0.4"')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rpm", type=int, help="server-side requests-per-minute limit")
+    parser.add_argument("--tpm", type=int, help="server-side prompt-tokens-per-minute limit")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    mock = MockLLM(
+        GroundTruthResponder(), latency=args.latency, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, rpm=args.rpm, tpm=args.tpm, seed=args.seed
+    )
+    serve(mock, args.port)
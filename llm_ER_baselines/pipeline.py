@@ -0,0 +1,270 @@
+"""
+Two-stage pipeline behind one entry point, with memoized stages:
+
+    load -> serialize -> index -> retrieve -> gate -> verify -> evaluate
+
+Every stage's output is stored under artifacts/pipeline/<stage>/<key>/,
+keyed by the config it depends on and its upstream keys, and is reused
+while that key is unchanged: changing HIGH_CONF re-runs gate / verify /
+evaluate from the stored candidates, changing TOP_K re-runs retrieval from
+the stored index, and an edited CSV re-runs everything. Verification
+checkpoints into its artifact directory, so an interrupted run resumes
+(unless verify or a stage before it is forced, which starts it over).
+
+Usage:
+    python pipeline.py
+    python pipeline.py --set HIGH_CONF=0.85 TOP_K=20
+    python pipeline.py --until retrieve
+    python pipeline.py --force index
+    python pipeline.py --status
+"""
+import argparse
+import ast
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sklearn.base import clone
+from sklearn.metrics import precision_recall_fscore_support
+
+from src.ann import RandomProjectionIndex
+from src.artifacts import file_digest
+from src.block_index import BlockIndex
+from src.blocker import vectorizer
+from src.candidate_store import CandidateStore
+from src.constants import *
+from src.evaluation import RECALL_KS, recall_at_k, recall_at_k_verified
+from src.loader import load, serialize_frame
+from src.metrics import METRICS
+from src.pipeline import PIPELINE_DIR, DirectoryFormat, Pipeline
+from src.retrieval import flatten_top_k, rerank_candidates, top_k
+
+# -------------------------------------------------------------------
+# Config (override with --set NAME=VALUE)
+# -------------------------------------------------------------------
+TOP_K = 50
+CHUNK_SIZE = 1024                # Amazon rows per sparse matmul block (speed only)
+CANDIDATE_GENERATOR = "tfidf"    # "tfidf" | "blocking" | "lsh"
+LSH_TABLES = 32
+LSH_BITS = 16
+LSH_MULTIPROBE = True
+
+# HIGH_CONF / LOW_CONF come from src.constants
+
+VERIFY_MODE = "pairwise"         # "pairwise" | "listwise"
+LISTWISE_BATCH_SIZE = 10
+PROMPT_BUDGETS = None            # e.g. FIELD_TOKEN_BUDGETS (src.compaction)
+CONCURRENCY = 8                  # throughput only, not part of any key
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+
+ARTIFACT_ROOT = PIPELINE_DIR
+METRICS_PATH = "metrics/pipeline"
+
+STAGES = ["load", "serialize", "index", "retrieve", "gate", "verify", "evaluate"]
+CONFIG_NAMES = [
+    "TOP_K", "CHUNK_SIZE", "CANDIDATE_GENERATOR", "LSH_TABLES", "LSH_BITS", "LSH_MULTIPROBE",
+    "HIGH_CONF", "LOW_CONF", "VERIFY_MODE", "LISTWISE_BATCH_SIZE", "PROMPT_BUDGETS",
+    "CONCURRENCY", "RPM_LIMIT", "TPM_LIMIT",
+]
+
+parser = argparse.ArgumentParser(description="Memoized two-stage ER pipeline")
+parser.add_argument("--set", nargs="*", default=[], metavar="NAME=VALUE",
+                    help=f"override config: {', '.join(CONFIG_NAMES)}")
+parser.add_argument("--until", choices=STAGES, default="evaluate", help="last stage to run")
+parser.add_argument("--force", nargs="*", default=[], choices=STAGES,
+                    help="re-run these stages (and everything after them)")
+parser.add_argument("--status", action="store_true", help="show stage keys and what is cached, run nothing")
+args = parser.parse_args()
+
+for assignment in args.set:
+    name, _, value = assignment.partition("=")
+    if name not in CONFIG_NAMES:
+        parser.error(f"unknown setting {name}")
+    if name == "PROMPT_BUDGETS" and value == "FIELD_TOKEN_BUDGETS":
+        from src.compaction import FIELD_TOKEN_BUDGETS as value
+    else:
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass   # bare strings, e.g. VERIFY_MODE=listwise
+    globals()[name] = value
+
+load_dotenv()
+start_time = time.perf_counter()
+
+# -------------------------------------------------------------------
+# Stages
+# -------------------------------------------------------------------
+def load_stage(ctx):
+    return {
+        "amazon": load(AMAZON_PATH),
+        "google": load(GOOGLE_PATH),
+        "gt": pd.read_csv(GT_PATH),
+    }
+
+
+def serialize_stage(ctx, data):
+    # the ground truth travels with the serialized records, so later stages
+    # never need the raw frames
+    out = {"gt": data["gt"][[AMAZON_ID_COL, GOOGLE_ID_COL]]}
+    for side, fields in (("amazon", AMAZON_FIELDS), ("google", GOOGLE_FIELDS)):
+        df = data[side]
+        out[side] = pd.DataFrame({"id": df["id"], "serialized": serialize_frame(df, fields)})
+    return out
+
+
+def index_stage(ctx, records):
+    fitted = clone(vectorizer)
+    google_tfidf = fitted.fit_transform(records["google"]["serialized"])
+    return {"vectorizer": fitted, "google_tfidf": google_tfidf.tocsr()}
+
+
+def retrieve_stage(ctx, records, index):
+    amazon_df, google_df = records["amazon"], records["google"]
+    amazon_tfidf = index["vectorizer"].transform(amazon_df["serialized"])
+    google_tfidf = index["google_tfidf"]
+
+    if CANDIDATE_GENERATOR == "blocking":
+        block_candidates = BlockIndex.build(google_df).query_frame(amazon_df)
+        top_idx, top_scores = rerank_candidates(amazon_tfidf, google_tfidf, block_candidates, TOP_K)
+    elif CANDIDATE_GENERATOR == "lsh":
+        lsh_index = RandomProjectionIndex(
+            n_tables=LSH_TABLES, n_bits=LSH_BITS, multiprobe=LSH_MULTIPROBE, chunk_size=CHUNK_SIZE
+        ).fit(google_tfidf)
+        top_idx, top_scores = lsh_index.query(amazon_tfidf, TOP_K)
+    else:
+        top_idx, top_scores = top_k(amazon_tfidf, google_tfidf, TOP_K, chunk_size=CHUNK_SIZE)
+
+    a_idx, g_idx, ranks, scores = flatten_top_k(top_idx, top_scores)
+    CandidateStore.write(ctx.path, amazon_df, google_df, a_idx, g_idx, ranks, scores)
+    return CandidateStore(ctx.path)
+
+
+def gate_stage(ctx, store):
+    scores = store.frame()["tfidf_score"].to_numpy(dtype=np.float64)
+    labels = np.full(len(scores), None, dtype=object)
+    labels[scores >= HIGH_CONF] = "match"
+    labels[scores <= LOW_CONF] = "no_match"
+    return pd.DataFrame({
+        "label": labels,
+        "confidence": np.where(pd.isna(labels), np.nan, 1.0),
+    })
+
+
+def verify_stage(ctx, store, gated):
+    # LLM setup (client, response cache) only when verification actually runs
+    from llm_verify import verify_listwise, verify_pairs_concurrent
+    from src.checkpoint import Checkpoint
+    from src.compaction import PromptCompactor
+
+    uncertain = np.flatnonzero(gated["label"].isna().to_numpy())
+    pairs = store.pair_texts(uncertain)
+    if PROMPT_BUDGETS:
+        pairs = PromptCompactor(PROMPT_BUDGETS).compact_pairs(pairs)
+
+    # an interrupted run with the same key resumes; --force verify starts over
+    checkpoint = Checkpoint(os.path.join(ctx.path, "checkpoint"), resume=not pipeline.forced("verify"))
+    if checkpoint.resumed:
+        print(f"[verify] resuming: {checkpoint.resumed} pairs already verified")
+
+    if VERIFY_MODE == "listwise":
+        outputs = verify_listwise(
+            pairs, batch_size=LISTWISE_BATCH_SIZE, max_workers=CONCURRENCY,
+            rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+        )
+    else:
+        outputs = verify_pairs_concurrent(
+            pairs, max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+        )
+    checkpoint.close()
+
+    if checkpoint.failed:
+        # failed pairs count as non-matches now and are retried next run
+        ctx.incomplete = f"{checkpoint.failed} pairs failed, see {checkpoint.dead_path}"
+
+    final_df = store.frame()
+    final_df["label"] = gated["label"].to_numpy()
+    final_df["confidence"] = gated["confidence"].to_numpy()
+    final_df.loc[uncertain, "label"] = [out["label"] if out else "no_match" for out in outputs]
+    final_df.loc[uncertain, "confidence"] = [out["confidence"] if out else np.nan for out in outputs]
+    return final_df
+
+
+def evaluate_stage(ctx, records, store, final_df):
+    gt_df = records["gt"]
+    gold = pd.MultiIndex.from_frame(gt_df[[AMAZON_ID_COL, GOOGLE_ID_COL]])
+    y_true = pd.MultiIndex.from_frame(final_df[[AMAZON_ID_COL, GOOGLE_ID_COL]]).isin(gold)
+    y_pred = (final_df["label"] == "match").to_numpy()
+
+    precision, recall, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average="binary", zero_division=0
+    )
+    return {
+        "candidates": len(final_df),
+        "recall_at_k_candidates": recall_at_k(store.frame(), gt_df, RECALL_KS),
+        "recall_at_k_verified": recall_at_k_verified(final_df, gt_df, RECALL_KS),
+        "precision": float(precision),
+        "recall": float(recall),
+        "f1": float(f1),
+    }
+
+
+# -------------------------------------------------------------------
+# Wiring: each config holds exactly what changes the stage's output
+# -------------------------------------------------------------------
+pipeline = Pipeline(ARTIFACT_ROOT, force=args.force)
+
+pipeline.add("load", load_stage, config={
+    "files": {path: file_digest(path) for path in (AMAZON_PATH, GOOGLE_PATH, GT_PATH)}
+})
+pipeline.add("serialize", serialize_stage, ["load"], config={
+    "amazon_fields": AMAZON_FIELDS, "google_fields": GOOGLE_FIELDS
+})
+pipeline.add("index", index_stage, ["serialize"], config={
+    "vectorizer": vectorizer.get_params()
+})
+pipeline.add("retrieve", retrieve_stage, ["serialize", "index"], fmt=DirectoryFormat(CandidateStore), config={
+    "top_k": TOP_K,
+    "generator": CANDIDATE_GENERATOR,
+    "lsh": [LSH_TABLES, LSH_BITS, LSH_MULTIPROBE] if CANDIDATE_GENERATOR == "lsh" else None,
+})
+pipeline.add("gate", gate_stage, ["retrieve"], config={
+    "high_conf": HIGH_CONF, "low_conf": LOW_CONF
+})
+pipeline.add("verify", verify_stage, ["retrieve", "gate"], config={
+    "mode": VERIFY_MODE,
+    "listwise_batch_size": LISTWISE_BATCH_SIZE if VERIFY_MODE == "listwise" else None,
+    "prompt_budgets": PROMPT_BUDGETS,
+    "prompt": PROMPT_TEMPLATE if VERIFY_MODE == "pairwise" else LISTWISE_PROMPT_TEMPLATE,
+})
+pipeline.add("evaluate", evaluate_stage, ["serialize", "retrieve", "verify"], config={
+    "recall_ks": RECALL_KS
+})
+
+if args.status:
+    for name, key, cached in pipeline.status():
+        print(f"{name:<10} {key}  {'cached' if cached else 'to run'}")
+    raise SystemExit
+
+result = pipeline.get(args.until)
+
+# -------------------------------------------------------------------
+# Report
+# -------------------------------------------------------------------
+print("\nStages")
+for name, action, seconds in pipeline.log:
+    print(f"  {name:<10} {action:<7} {seconds:.2f}s")
+print(f"Total time (sec): {time.perf_counter() - start_time:.2f}")
+
+if args.until == "evaluate":
+    print("\nRecall@k: candidates -> after verification")
+    for k in RECALL_KS:
+        print(f"Recall@{k}: {result['recall_at_k_candidates'][k]:.4f} -> {result['recall_at_k_verified'][k]:.4f}")
+    print(f"\nPrecision: {result['precision']:.4f}")
+    print(f"Recall:    {result['recall']:.4f}")
+    print(f"F1 score:  {result['f1']:.4f}")
+
+METRICS.export(METRICS_PATH)
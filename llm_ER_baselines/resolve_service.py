@@ -0,0 +1,198 @@
+"""
+Online single-record resolution on top of the two-stage pipeline.
+
+The Google index is loaded once (warm-started from ./artifacts when
+possible) and kept in memory; each incoming Amazon-style record is
+serialized, retrieved against it and verified with the same HIGH_CONF /
+LOW_CONF gates and LLM cache as run_verification.py. LLM calls of all
+concurrent requests share one worker pool and one RPM / TPM limiter.
+
+Usage:
+    python resolve_service.py                 # JSON lines on stdin -> stdout
+    python resolve_service.py --http 8080     # POST /resolve with a JSON record
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+from dotenv import load_dotenv
+
+from src.artifacts import load_or_fit
+from src.blocker import vectorizer
+from src.constants import *
+from src.loader import load, serialize_frame, serialize_record
+from src.rate_limit import RateLimiter
+from src.response_parsing import VerificationError
+from src.retrieval import top_k
+
+load_dotenv()
+
+TOP_K = 50
+CONCURRENCY = 8        # parallel LLM calls, shared by all requests
+RPM_LIMIT = 500        # requests per minute across all requests, None to disable
+TPM_LIMIT = 200_000    # tokens per minute across all requests, None to disable
+
+
+class Resolver:
+    """
+    Long-lived resolver: holds the fitted vectorizer and Google TF-IDF
+    matrix and resolves one record at a time. `resolve` is thread-safe; the
+    LLM executor and rate limiter are shared, so the limits hold for the
+    whole process however many requests are in flight.
+    """
+
+    def __init__(self, top_k=TOP_K, high_conf=HIGH_CONF, low_conf=LOW_CONF,
+                 use_llm=True, concurrency=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT):
+        self.top_k = top_k
+        self.high_conf = high_conf
+        self.low_conf = low_conf
+        self.use_llm = use_llm
+        self.concurrency = concurrency
+
+        start = time.perf_counter()
+        self.google_df = load(GOOGLE_PATH)
+        self.google_df["serialized"] = serialize_frame(self.google_df, GOOGLE_FIELDS)
+        self.google_tfidf = load_or_fit(
+            GOOGLE_PATH, self.google_df, vectorizer, extra_config=GOOGLE_FIELDS
+        )
+        self.google_ids = self.google_df["id"].to_numpy()
+        self.google_text = self.google_df["serialized"].to_numpy()
+        self.load_sec = time.perf_counter() - start
+
+        if use_llm:
+            # imported lazily: --no-llm runs never open the LLM cache
+            from llm_verify import verify_pair
+            self._verify = verify_pair
+            self.limiter = RateLimiter(rpm, tpm) if (rpm or tpm) else None
+            self.pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def close(self):
+        if self.use_llm:
+            self.pool.shutdown()
+
+    def resolve(self, record: dict) -> dict:
+        latency = {}
+        t0 = time.perf_counter()
+
+        serialized = serialize_record(record, AMAZON_FIELDS)
+        t1 = time.perf_counter()
+        latency["serialize_ms"] = (t1 - t0) * 1000
+
+        query = vectorizer.transform([serialized])
+        idx, scores = top_k(query, self.google_tfidf, self.top_k)
+        t2 = time.perf_counter()
+        latency["retrieve_ms"] = (t2 - t1) * 1000
+
+        candidates = []
+        uncertain = []
+        for rank, (g_idx, score) in enumerate(zip(idx[0], scores[0]), start=1):
+            candidate = {
+                GOOGLE_ID_COL: self.google_ids[g_idx],
+                "rank": rank,
+                "tfidf_score": float(score),
+            }
+            if score >= self.high_conf:
+                candidate.update(label="match", confidence=1.0, source="gate")
+            elif score <= self.low_conf:
+                candidate.update(label="no_match", confidence=1.0, source="gate")
+            else:
+                candidate.update(label="uncertain", confidence=None, source="gate")
+                uncertain.append((candidate, g_idx))
+            candidates.append(candidate)
+
+        if self.use_llm and uncertain:
+            outputs = list(self.pool.map(
+                lambda g_idx: self._verify(serialized, self.google_text[g_idx], limiter=self.limiter),
+                [g_idx for _, g_idx in uncertain]
+            ))
+            for (candidate, _), out in zip(uncertain, outputs):
+                candidate.update(
+                    label=out["label"], confidence=out["confidence"], source="llm"
+                )
+        t3 = time.perf_counter()
+        latency["verify_ms"] = (t3 - t2) * 1000
+        latency["total_ms"] = (t3 - t0) * 1000
+
+        return {
+            AMAZON_ID_COL: record.get("id"),
+            "matches": [c for c in candidates if c["label"] == "match"],
+            "candidates": candidates,
+            "llm_verified": len(uncertain) if self.use_llm else 0,
+            "latency": latency,
+        }
+
+
+# -------------------------------------------------------------------
+# Front-ends
+# -------------------------------------------------------------------
+def _error_status(error) -> int:
+    """400 for a malformed request, 502 when the LLM failed, 500 otherwise."""
+    if isinstance(error, (json.JSONDecodeError, KeyError)):
+        return 400
+    if isinstance(error, (openai.APIError, VerificationError)):
+        return 502
+    return 500
+
+
+def serve_stdio(resolver):
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = resolver.resolve(json.loads(line))
+        except Exception as e:   # keep serving; report the failure in-band
+            result = {"error": f"{type(e).__name__}: {e}"}
+        print(json.dumps(result, default=str), flush=True)
+
+
+def serve_http(resolver, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/resolve":
+                self.send_error(404)
+                return
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                payload = json.dumps(resolver.resolve(json.loads(body)), default=str)
+                status = 200
+            except Exception as e:
+                payload = json.dumps({"error": f"{type(e).__name__}: {e}"})
+                status = _error_status(e)
+
+            data = payload.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    print(f"Serving on http://127.0.0.1:{port}/resolve", file=sys.stderr)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--http", type=int, metavar="PORT", help="serve HTTP instead of stdin/stdout")
+    parser.add_argument("--top-k", type=int, default=TOP_K)
+    parser.add_argument("--no-llm", action="store_true", help="gate only; leave uncertain pairs unverified")
+    args = parser.parse_args()
+
+    resolver = Resolver(top_k=args.top_k, use_llm=not args.no_llm)
+    print(f"Index loaded in {resolver.load_sec:.2f}s ({len(resolver.google_ids)} records)", file=sys.stderr)
+
+    try:
+        if args.http:
+            serve_http(resolver, args.http)
+        else:
+            serve_stdio(resolver)
+    finally:
+        resolver.close()
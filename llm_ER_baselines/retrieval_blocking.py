@@ -5,11 +5,16 @@ import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
 
-from sklearn.metrics.pairwise import cosine_similarity
-
-from src.loader import load, serialize_record
+from src.loader import load, serialize_frame
 from src.constants import *
 from src.blocker import vectorizer   # only using vectorizer, NOT blocking
+from src.block_index import BlockIndex
+from src.candidate_store import CandidateStore
+from src.evaluation import RECALL_KS, recall_at_k
+from src.ann import RandomProjectionIndex
+from src.artifacts import load_or_fit
+from src.parallel import parallel_top_k
+from src.retrieval import top_k, rerank_candidates, flatten_top_k
 
 # -------------------------------------------------------------------
 # Setup
@@ -19,84 +24,116 @@ random.seed(42)
 np.random.seed(42)
 
 TOP_K = 50
-start = time.perf_counter()
-
-# -------------------------------------------------------------------
-# Load data
-# -------------------------------------------------------------------
-amazon_df = load(AMAZON_PATH)
-amazon_df["serialized"] = amazon_df.apply(
-    lambda r: serialize_record(r, AMAZON_FIELDS), axis=1
-)
-
-google_df = load(GOOGLE_PATH)
-google_df["serialized"] = google_df.apply(
-    lambda r: serialize_record(r, GOOGLE_FIELDS), axis=1
-)
-
-gt_df = pd.read_csv(GT_PATH)
-
-# -------------------------------------------------------------------
-# TF-IDF (fit ONCE on Google)
-# -------------------------------------------------------------------
-google_tfidf = vectorizer.fit_transform(google_df["serialized"])
-
-# -------------------------------------------------------------------
-# Candidate generation (SIMILARITY ONLY)
-# -------------------------------------------------------------------
-rows = []
-
-for _, a_row in amazon_df.iterrows():
-    amazon_id = a_row["id"]
-
-    amazon_vec = vectorizer.transform([a_row["serialized"]])
-
-    # cosine similarity against ALL google
-    scores = cosine_similarity(amazon_vec, google_tfidf)[0]
-
-    # top-k indices
-    top_idx = np.argsort(scores)[::-1][:TOP_K]
-
-    for rank, g_idx in enumerate(top_idx, start=1):
-        rows.append({
-            AMAZON_ID_COL: amazon_id,
-            GOOGLE_ID_COL: google_df.iloc[g_idx]["id"],
-            "rank": rank,
-            "tfidf_score": float(scores[g_idx]),
-            "amazon_serialized": a_row["serialized"],
-            "google_serialized": google_df.iloc[g_idx]["serialized"],
+CHUNK_SIZE = 1024   # Amazon rows scored per sparse matmul block
+N_WORKERS = 1       # >1 shards the exact scan over a process pool
+
+# "tfidf": brute-force TF-IDF top-K over all Google records
+# "blocking": TF-IDF top-K within the rule-based block index candidates
+# "lsh": TF-IDF top-K within random-projection LSH buckets (approximate)
+CANDIDATE_GENERATOR = "tfidf"
+
+# LSH recall/speed knobs: more tables or multiprobe -> higher recall, slower;
+# more bits -> smaller buckets, faster, lower recall
+LSH_TABLES = 32
+LSH_BITS = 16
+LSH_MULTIPROBE = True
+COMPARE_WITH_EXACT = True   # also report exact-scan recall for approximate generators
+
+CANDIDATES_DIR = "candidates"
+
+
+# Everything below runs under main(): with N_WORKERS > 1 the process pool
+# may re-import this module in its workers (spawn / forkserver start
+# methods), and that import must not load the data or start another pool.
+def main():
+    start = time.perf_counter()
+
+    # -------------------------------------------------------------------
+    # Load data
+    # -------------------------------------------------------------------
+    amazon_df = load(AMAZON_PATH)
+    amazon_df["serialized"] = serialize_frame(amazon_df, AMAZON_FIELDS)
+
+    google_df = load(GOOGLE_PATH)
+    google_df["serialized"] = serialize_frame(google_df, GOOGLE_FIELDS)
+
+    gt_df = pd.read_csv(GT_PATH)
+
+    # -------------------------------------------------------------------
+    # TF-IDF (fit ONCE on Google, then reused from ./artifacts while the
+    # Google CSV and vectorizer config are unchanged)
+    # -------------------------------------------------------------------
+    google_tfidf = load_or_fit(
+        GOOGLE_PATH, google_df, vectorizer, extra_config=GOOGLE_FIELDS
+    )
+
+    # -------------------------------------------------------------------
+    # Candidate generation (SIMILARITY ONLY)
+    # -------------------------------------------------------------------
+    amazon_tfidf = vectorizer.transform(amazon_df["serialized"])
+
+    def exact_top_k():
+        # cosine similarity against ALL google, one block of Amazon rows at a time
+        if N_WORKERS > 1:
+            return parallel_top_k(
+                amazon_tfidf, google_tfidf, TOP_K, n_workers=N_WORKERS, chunk_size=CHUNK_SIZE
+            )
+        return top_k(amazon_tfidf, google_tfidf, TOP_K, chunk_size=CHUNK_SIZE)
+
+    def to_candidates_df(a_idx, g_idx, ranks, scores):
+        return pd.DataFrame({
+            AMAZON_ID_COL: amazon_df["id"].to_numpy()[a_idx],
+            GOOGLE_ID_COL: google_df["id"].to_numpy()[g_idx],
+            "rank": ranks,
+            "tfidf_score": scores,
         })
 
-candidates_df = pd.DataFrame(rows)
-
-print("Total candidates:", len(candidates_df))
-
-# -------------------------------------------------------------------
-# Candidate generation recall@K (BLOCKING QUALITY)
-# -------------------------------------------------------------------
-def recall_at_k_blocking(candidates_df, gt_df, k):
-    hits = 0
-    grouped = candidates_df.groupby(AMAZON_ID_COL)
-
-    for _, row in gt_df.iterrows():
-        aid = row[AMAZON_ID_COL]
-        gid = row[GOOGLE_ID_COL]
-
-        if aid not in grouped.groups:
-            continue
-
-        topk = grouped.get_group(aid).sort_values("rank").head(k)
-        if gid in topk[GOOGLE_ID_COL].values:
-            hits += 1
-
-    return hits / len(gt_df)
-
-
-print("\nCandidate generation recall (before LLM)")
-for k in [5, 10, 20, 50]:
-    print(f"Recall@{k}: {recall_at_k_blocking(candidates_df, gt_df, k):.4f}")
-
-# -------------------------------------------------------------------
-# Save for LLM verification
-# -------------------------------------------------------------------
-candidates_df.to_csv("candidates.csv", index=False)
\ No newline at end of file
+    if CANDIDATE_GENERATOR == "blocking":
+        block_index = BlockIndex.build(google_df)
+        block_candidates = block_index.query_frame(amazon_df)
+        top_idx, top_scores = rerank_candidates(
+            amazon_tfidf, google_tfidf, block_candidates, TOP_K
+        )
+    elif CANDIDATE_GENERATOR == "lsh":
+        lsh_index = RandomProjectionIndex(
+            n_tables=LSH_TABLES, n_bits=LSH_BITS, multiprobe=LSH_MULTIPROBE,
+            chunk_size=CHUNK_SIZE
+        ).fit(google_tfidf)
+        top_idx, top_scores = lsh_index.query(amazon_tfidf, TOP_K)
+    else:
+        top_idx, top_scores = exact_top_k()
+
+    # blocks / LSH buckets may hold fewer than TOP_K records
+    a_idx, g_idx, ranks, scores = flatten_top_k(top_idx, top_scores)
+    candidates_df = to_candidates_df(a_idx, g_idx, ranks, scores)
+
+    print("Total candidates:", len(candidates_df))
+
+    # -------------------------------------------------------------------
+    # Candidate generation recall@K (BLOCKING QUALITY)
+    # -------------------------------------------------------------------
+    print("\nCandidate generation recall (before LLM)")
+    blocking_recall = recall_at_k(candidates_df, gt_df, RECALL_KS)
+    for k, recall in blocking_recall.items():
+        print(f"Recall@{k}: {recall:.4f}")
+
+    if CANDIDATE_GENERATOR != "tfidf" and COMPARE_WITH_EXACT:
+        exact_df = to_candidates_df(*flatten_top_k(*exact_top_k()))
+
+        exact_recall = recall_at_k(exact_df, gt_df, RECALL_KS)
+
+        print(f"\nRecall@K: {CANDIDATE_GENERATOR} vs exact TF-IDF scan")
+        for k in RECALL_KS:
+            approx, exact = blocking_recall[k], exact_recall[k]
+            print(f"Recall@{k}: {approx:.4f} vs {exact:.4f} ({approx - exact:+.4f})")
+
+    # -------------------------------------------------------------------
+    # Save for LLM verification (record text is stored once per record)
+    # -------------------------------------------------------------------
+    CandidateStore.write(
+        CANDIDATES_DIR, amazon_df, google_df, a_idx, g_idx, ranks, scores
+    )
+
+
+if __name__ == "__main__":
+    main()
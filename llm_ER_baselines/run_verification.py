@@ -1,96 +1,374 @@
+import argparse
 import pandas as pd
-from llm_verify import call_llm
+from llm_verify import estimate_cost, verify_pair, verify_pairs_concurrent, verify_listwise, run_batch
+from src.batch import LocalBatchClient, OpenAIBatchClient
+from src.candidate_store import CandidateStore
+from src.checkpoint import Checkpoint
+from src.cascade import LocalCascade
+from src.compaction import PromptCompactor, compaction_report
 from src.constants import AMAZON_ID_COL, GOOGLE_ID_COL
+from src.llm_client import get_client
 from sklearn.metrics import precision_recall_fscore_support
-from src.constants import GT_PATH
+from src.constants import GT_PATH, HIGH_CONF, LOW_CONF
+from src.evaluation import RECALL_KS, recall_at_k_verified
+from src.labels import generate_gold_df
+from src.metrics import METRICS, Profiler
+from src.early_stop import StopRule, verify_ranked
+from src.scheduler import BudgetScheduler, ScoreCalibration
 import time
 # -----------------------
 # Config
 # -----------------------
-HIGH_CONF = 0.90
-LOW_CONF = 0.30
+CONCURRENCY = 8        # max in-flight LLM requests (1 = sequential)
+RPM_LIMIT = 500        # requests per minute, None to disable
+TPM_LIMIT = 200_000    # tokens per minute, None to disable
 
-llm_calls = 0
-total_tokens = 0
+VERIFY_MODE = "pairwise"   # "pairwise" | "listwise" | "batch" | "ranked"
+LISTWISE_BATCH_SIZE = 10   # Google candidates per listwise prompt
+
+# "ranked": walk each Amazon record's candidates in rank order and stop early
+RANKED_MATCH_CONFIDENCE = 0.9   # a match at or above this confidence counts as confirmed
+RANKED_MAX_MATCHES = 1          # stop after this many confirmed matches (None = never)
+RANKED_MAX_REJECTS = None       # stop after this many no_match verdicts in a row (None = never)
+
+BATCH_BACKEND = "openai"   # "openai" | "local" (offline stand-in)
+BATCH_JOB_PATH = "verification_batch.jsonl"
+BATCH_POLL_SEC = 60
+
+# Budgeted verification (pairwise / listwise): spend at most this many live
+# LLM requests / tokens on the most informative uncertain pairs; the rest
+# get the calibrated fallback label. None = verify every uncertain pair.
+BUDGET_CALLS = None
+BUDGET_TOKENS = None
+
+# Calibrate HIGH/LOW gates from this many labelled candidate rows (None =
+# fixed HIGH_CONF / LOW_CONF). Labels come from GT_PATH here, so the sample
+# overlaps the evaluation set; use a separately labelled sample in production.
+CALIBRATION_SAMPLE = None
+TARGET_PRECISION = 0.98   # accepted-by-gate precision
+MAX_MISS_RATE = 0.01      # share of matches the reject gate may drop
+
+# Compact records to per-field token budgets before prompting (e.g.
+# src.compaction.FIELD_TOKEN_BUDGETS); None sends the full serialized
+# records. Compacted prompts are cached separately from full ones.
+PROMPT_BUDGETS = None
+
+# Local classifier cascade between the TF-IDF gates and the LLM: a
+# "logistic" or "gbdt" model on pair features, trained on generate_gold_df
+# pairs (hard negatives from the candidates). It settles the uncertain pairs
+# it is confident about; only the ambiguous rest reaches the LLM. The
+# training labels come from GT_PATH, so the gold pairs of a
+# CASCADE_TRAIN_SHARE of the Amazon records are used for training and those
+# records are left out of the final metrics. None = off.
+CASCADE_MODEL = None
+CASCADE_TRAIN_SHARE = 0.5  # share of Amazon records whose gold pairs train the cascade
+CASCADE_PRECISION = 0.98   # precision of local accepts (held-out gold pairs)
+CASCADE_MISS_RATE = 0.01   # share of matches local rejects may drop
+
+# Verdicts are streamed to <CHECKPOINT_PATH>.results.jsonl and pairs that
+# fail after retries to <CHECKPOINT_PATH>.dead.jsonl instead of stopping the
+# run; --resume skips the pairs already completed there.
+CHECKPOINT_PATH = "checkpoints/run_verification"
+
+METRICS_PATH = "metrics/run_verification"   # writes .json and .prom at the end of the run
+PROFILE_CPU = False                          # cProfile -> <METRICS_PATH>.prof
+PROFILE_MEMORY = False                       # tracemalloc -> <METRICS_PATH>.mem.txt
+
+parser = argparse.ArgumentParser(description="LLM verification of retrieved candidates")
+parser.add_argument("--resume", action="store_true", help="skip pairs completed by an interrupted run")
+args = parser.parse_args()
+
+checkpoint = Checkpoint(CHECKPOINT_PATH, resume=args.resume)
+if args.resume:
+    print(f"Resuming: {checkpoint.resumed} pairs already verified")
+
+profiler = Profiler(cpu=PROFILE_CPU, memory=PROFILE_MEMORY, metrics=METRICS).start()
 start_time = time.perf_counter()
 
 # -----------------------
 # Load data
 # -----------------------
-candidates_df = pd.read_csv("candidates.csv")
-gt_df = pd.read_csv(GT_PATH)  # adjust path if needed
+with METRICS.span("load"):
+    candidate_store = CandidateStore("candidates")
+    candidates_df = candidate_store.frame()
+    gt_df = pd.read_csv(GT_PATH)  # adjust path if needed
 
 gold_pairs = set(zip(gt_df[AMAZON_ID_COL], gt_df[GOOGLE_ID_COL]))
 
-results = []
-llm_calls = 0
+if CALIBRATION_SAMPLE:
+    sample = candidates_df.sample(
+        n=min(CALIBRATION_SAMPLE, len(candidates_df)), random_state=42
+    )
+    sample_labels = [
+        int(pair in gold_pairs)
+        for pair in zip(sample[AMAZON_ID_COL], sample[GOOGLE_ID_COL])
+    ]
+    calibration = ScoreCalibration.fit(
+        sample["tfidf_score"], sample_labels,
+        target_precision=TARGET_PRECISION, max_miss_rate=MAX_MISS_RATE
+    )
+else:
+    calibration = ScoreCalibration.default(LOW_CONF, HIGH_CONF)
+
+high_conf, low_conf = calibration.high, calibration.low
+print(f"Gates: accept >= {high_conf:.3f}, reject <= {low_conf:.3f}, boundary {calibration.boundary:.3f}")
 
 # -----------------------
 # LLM verification + gating
 # -----------------------
-for _, row in candidates_df.iterrows():
-    score = row["tfidf_score"]
+labels = [None] * len(candidates_df)
+confidences = [None] * len(candidates_df)
+uncertain = []
 
-    if score >= HIGH_CONF:
-        label = "match"
-        confidence = 1.0
+with METRICS.span("gate"):
+    for i, score in enumerate(candidates_df["tfidf_score"]):
+        if score >= high_conf:
+            labels[i] = "match"
+            confidences[i] = 1.0
 
-    elif score <= LOW_CONF:
-        label = "no_match"
-        confidence = 1.0
+        elif score <= low_conf:
+            labels[i] = "no_match"
+            confidences[i] = 1.0
 
-    else:
-        llm_calls += 1
-        out = call_llm(
-            row["amazon_serialized"],
-            row["google_serialized"]
+        else:
+            uncertain.append(i)
+
+    # record text is only decoded for the pairs that reach the LLM
+    pairs = candidate_store.pair_texts(uncertain)
+
+cascade_decided = 0
+cascade_train_ids = set()   # Amazon ids the cascade saw labels for
+if CASCADE_MODEL:
+    with METRICS.span("cascade"):
+        # training pairs need text, so they are drawn from records in the store
+        gold_df = generate_gold_df(
+            gt_df, candidate_store.google.all_ids(), candidates_df=candidates_df
         )
-        label = out["label"]
-        confidence = out["confidence"]
-        total_tokens += out.get("tokens", 0)
-
-    results.append({
-        AMAZON_ID_COL: row[AMAZON_ID_COL],
-        GOOGLE_ID_COL: row[GOOGLE_ID_COL],
-        "label": label,
-        "confidence": confidence,
-        "rank": row["rank"]
-    })
-
-end_time = time.perf_counter()
-total_time = end_time - start_time
-total_pairs = len(candidates_df)
+        train_ids = gold_df[AMAZON_ID_COL].drop_duplicates().sample(
+            frac=CASCADE_TRAIN_SHARE, random_state=42
+        )
+        cascade_train_ids = set(train_ids)
+        gold_df = gold_df[gold_df[AMAZON_ID_COL].isin(cascade_train_ids)].copy()
+        gold_df["amazon_text"] = candidate_store.amazon.texts_for(gold_df[AMAZON_ID_COL])
+        gold_df["google_text"] = candidate_store.google.texts_for(gold_df[GOOGLE_ID_COL])
+        gold_df = gold_df.dropna(subset=["amazon_text", "google_text"])
+
+        cascade = LocalCascade(CASCADE_MODEL).fit(
+            gold_df["amazon_text"], gold_df["google_text"], gold_df["label"],
+            groups=gold_df[AMAZON_ID_COL],
+            corpus=candidate_store.amazon.texts(range(len(candidate_store.amazon)))
+                   + candidate_store.google.texts(range(len(candidate_store.google))),
+            target_precision=CASCADE_PRECISION, max_miss_rate=CASCADE_MISS_RATE
+        )
+
+        probabilities = cascade.predict_proba([a for a, _ in pairs], [g for _, g in pairs])
+        local_labels = cascade.decide(probabilities)
+
+        still_uncertain = []
+        for row, pair, label, p in zip(uncertain, pairs, local_labels, probabilities):
+            if label is None:
+                still_uncertain.append((row, pair))
+            else:
+                labels[row] = label
+                confidences[row] = float(max(p, 1.0 - p))
+        cascade_decided = len(uncertain) - len(still_uncertain)
+        uncertain = [row for row, _ in still_uncertain]
+        pairs = [pair for _, pair in still_uncertain]
+
+    print(
+        f"Cascade ({CASCADE_MODEL}): accept P >= {cascade.calibration.high:.3f}, "
+        f"reject P <= {cascade.calibration.low:.3f}; "
+        f"{cascade_decided} pairs decided locally, {len(pairs)} left for the LLM"
+    )
+    METRICS.inc("pairs_decided_total", cascade_decided, stage="cascade")
+
+prompt_report = None
+if PROMPT_BUDGETS:
+    with METRICS.span("compact"):
+        compacted = PromptCompactor(PROMPT_BUDGETS).compact_pairs(pairs)
+        prompt_report = compaction_report(pairs, compacted)
+    pairs = compacted
+
+budget_report = None
+ranked_stats = None
+n_verified = len(pairs)
+
+with METRICS.span("verify"):
+    if VERIFY_MODE == "ranked":
+        position = {row: n for n, row in enumerate(uncertain)}
+        # `labels` holds the gate verdicts so far, None where the LLM is needed
+        ranked_outputs, ranked_stats = verify_ranked(
+            candidates_df[AMAZON_ID_COL], candidates_df["rank"], labels,
+            lambda rows: verify_pairs_concurrent(
+                [pairs[position[row]] for row in rows],
+                max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+            ),
+            StopRule(
+                match_confidence=RANKED_MATCH_CONFIDENCE,
+                max_matches=RANKED_MAX_MATCHES,
+                max_consecutive_rejects=RANKED_MAX_REJECTS
+            )
+        )
+        # candidates ranked below the stopping point are left as non-matches
+        outputs = [
+            ranked_outputs[row] or {"label": "no_match", "confidence": None}
+            for row in uncertain
+        ]
+        n_verified = ranked_stats["verified"]
+    elif (BUDGET_CALLS or BUDGET_TOKENS) and VERIFY_MODE in ("pairwise", "listwise"):
+        if VERIFY_MODE == "listwise":
+            verify_fn = lambda wave: verify_listwise(
+                wave, batch_size=LISTWISE_BATCH_SIZE,
+                max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+            )
+        else:
+            verify_fn = lambda wave: verify_pairs_concurrent(
+                wave, max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+            )
 
-avg_latency = total_time / total_pairs
-throughput = total_pairs / total_time
+        scheduler = BudgetScheduler(
+            calibration, max_calls=BUDGET_CALLS, max_tokens=BUDGET_TOKENS,
+            wave_size=max(64, CONCURRENCY * 16), metrics=METRICS
+        )
+        uncertain_rows = candidates_df.iloc[uncertain]
+        outputs, budget_report = scheduler.run(
+            uncertain_rows["tfidf_score"], uncertain_rows[AMAZON_ID_COL], pairs,
+            verify_fn, estimate_cost,
+            confident_amazon=candidates_df.loc[
+                [label == "match" for label in labels], AMAZON_ID_COL
+            ]
+        )
+        # pairs the budget did not reach get the calibrated fallback label
+        outputs = [
+            out if out is not None else {
+                "label": scheduler.fallback_label(score), "confidence": None
+            }
+            for out, score in zip(outputs, uncertain_rows["tfidf_score"])
+        ]
+        n_verified = budget_report["verified"]
+    elif VERIFY_MODE == "listwise":
+        outputs = verify_listwise(
+            pairs, batch_size=LISTWISE_BATCH_SIZE,
+            max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+        )
+    elif VERIFY_MODE == "batch":
+        if BATCH_BACKEND == "local":
+            batch_client = LocalBatchClient("batch_jobs")
+        else:
+            batch_client = OpenAIBatchClient(get_client())
 
+        outputs = run_batch(
+            pairs, batch_client, BATCH_JOB_PATH, poll_interval=BATCH_POLL_SEC
+        )
+        # requests the (completed) job errored on or that failed validation
+        # fall back to rate-limited interactive calls
+        retry = [i for i, out in enumerate(outputs) if out is None]
+        for i, out in zip(retry, verify_pairs_concurrent(
+            [pairs[i] for i in retry],
+            max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+        )):
+            outputs[i] = out
+    elif CONCURRENCY > 1:
+        outputs = verify_pairs_concurrent(
+            pairs, max_workers=CONCURRENCY, rpm=RPM_LIMIT, tpm=TPM_LIMIT, checkpoint=checkpoint
+        )
+    else:
+        outputs = [verify_pair(a, g, checkpoint=checkpoint) for a, g in pairs]
+
+checkpoint.close()
+
+# pairs that failed after retries are in the dead-letter file; they are left
+# as non-matches and retried by the next --resume
+outputs = [out or {"label": "no_match", "confidence": None} for out in outputs]
+
+# outputs are aligned with `uncertain`, so results keep file order
+for i, out in zip(uncertain, outputs):
+    labels[i] = out["label"]
+    confidences[i] = out["confidence"]
+
+results = {
+    AMAZON_ID_COL: candidates_df[AMAZON_ID_COL],
+    GOOGLE_ID_COL: candidates_df[GOOGLE_ID_COL],
+    "label": labels,
+    "confidence": confidences,
+    "rank": candidates_df["rank"]
+}
+
+total_time = time.perf_counter() - start_time
+total_pairs = len(candidates_df)
+verify_time = METRICS.stage_seconds("verify")
+latency = METRICS.summary(
+    "llm_request_seconds", mode="listwise" if VERIFY_MODE == "listwise" else "pairwise"
+)
+
+# gated pairs never reach the LLM, so verification throughput is measured
+# over the uncertain pairs only; latency percentiles cover live requests
 print("\nRuntime metrics")
 print(f"Total time (sec): {total_time:.2f}")
-print(f"Avg latency per pair (sec): {avg_latency:.4f}")
-print(f"Throughput (pairs/sec): {throughput:.2f}")
+for stage in ("load", "gate", "cascade", "compact", "verify"):
+    print(f"  {stage:<7} {METRICS.stage_seconds(stage):.2f}s")
+print(f"Candidate pairs/sec (incl. gated): {total_pairs / total_time:.2f}")
+if n_verified:
+    print(f"Verified pairs/sec: {n_verified / verify_time:.2f}")
+if latency["count"]:
+    print(
+        f"LLM request latency (sec): p50 {latency['p50']:.3f}  "
+        f"p95 {latency['p95']:.3f}  p99 {latency['p99']:.3f}"
+    )
+
+if prompt_report is not None and prompt_report["pairs"]:
+    print("\nPrompt size (estimated tokens per pairwise prompt)")
+    print(f"Mean: {prompt_report['mean_before']:.1f} -> {prompt_report['mean_after']:.1f}")
+    print(f"p95:  {prompt_report['p95_before']:.1f} -> {prompt_report['p95_after']:.1f}")
+    print(
+        f"Total: {prompt_report['total_before']} -> {prompt_report['total_after']} "
+        f"({prompt_report['reduction']:.1%} smaller)"
+    )
+    METRICS.set("prompt_tokens_estimated", prompt_report["total_before"], prompt="full")
+    METRICS.set("prompt_tokens_estimated", prompt_report["total_after"], prompt="compacted")
+
+if ranked_stats is not None:
+    print("\nEarly termination")
+    print(f"Verified / skipped calls: {ranked_stats['verified']} / {ranked_stats['skipped']}")
+    print(f"Records stopped on a confirmed match: {ranked_stats['stopped_on_match']}")
+    print(f"Records stopped on consecutive rejects: {ranked_stats['stopped_on_rejects']}")
+    METRICS.inc("llm_calls_skipped_total", ranked_stats["skipped"], reason="early_stop")
+
+if budget_report is not None:
+    print("\nBudget")
+    print(f"Verified / skipped: {budget_report['verified']} / {budget_report['skipped']}")
+    print(f"Spent: {budget_report['calls']} requests, {budget_report['tokens']} tokens")
+    if calibration.fitted:
+        # expected matches over all candidates, from the calibrated P(match | score)
+        expected_matches = calibration.match_probability(candidates_df["tfidf_score"]).sum()
+        print(f"Expected missed matches: {budget_report['expected_missed_matches']:.1f}")
+        print(f"Expected false matches: {budget_report['expected_false_matches']:.1f}")
+        print(f"Estimated recall loss: {budget_report['expected_missed_matches'] / max(expected_matches, 1e-12):.2%}")
+    else:
+        print("Recall loss not estimated: the gates are uncalibrated (set CALIBRATION_SAMPLE)")
+    METRICS.inc("llm_calls_skipped_total", budget_report["skipped"], reason="budget")
 
 final_df = pd.DataFrame(results)
 
+# records whose gold pairs trained the cascade would flatter the metrics
+eval_df, eval_gt_df = final_df, gt_df
+if cascade_train_ids:
+    eval_df = final_df[~final_df[AMAZON_ID_COL].isin(cascade_train_ids)]
+    eval_gt_df = gt_df[~gt_df[AMAZON_ID_COL].isin(cascade_train_ids)]
+    print(
+        f"\nEvaluating on {eval_df[AMAZON_ID_COL].nunique()} Amazon records; "
+        f"{len(cascade_train_ids)} used to train the cascade are excluded"
+    )
+
 # -----------------------
 # Recall@k (after verification)
 # -----------------------
-def recall_at_k_verified(df, gold_pairs, k):
-    hits = 0
-    grouped = df[df["label"] == "match"].groupby(AMAZON_ID_COL)
-
-    for aid, gid in gold_pairs:
-        if aid not in grouped.groups:
-            continue
-        topk = grouped.get_group(aid).sort_values("rank").head(k)
-        if gid in topk[GOOGLE_ID_COL].values:
-            hits += 1
-
-    return hits / len(gold_pairs)
-
+with METRICS.span("evaluate"):
+    verified_recall = recall_at_k_verified(eval_df, eval_gt_df, RECALL_KS)
 
 print("\nRecall AFTER LLM verification")
-for k in [5, 10, 20, 50]:
-    print(f"Recall@{k}: {recall_at_k_verified(final_df, gold_pairs, k):.4f}")
+for k, recall in verified_recall.items():
+    print(f"Recall@{k}: {recall:.4f}")
 
 # -----------------------
 # Final Precision / Recall / F1
@@ -98,7 +376,7 @@ for k in [5, 10, 20, 50]:
 y_true = []
 y_pred = []
 
-for _, row in final_df.iterrows():
+for _, row in eval_df.iterrows():
     pair = (row[AMAZON_ID_COL], row[GOOGLE_ID_COL])
     y_true.append(1 if pair in gold_pairs else 0)
     y_pred.append(1 if row["label"] == "match" else 0)
@@ -115,17 +393,28 @@ print(f"F1 score:  {f1:.4f}")
 # -----------------------
 # LLM savings
 # -----------------------
-total_pairs = len(candidates_df)
-saved_calls = total_pairs - llm_calls
+# verdicts served from the cache cost nothing this run; listwise / batch
+# requests cover several pairs each
+llm_calls = METRICS.total("llm_calls_total")
+prompt_tokens = METRICS.total("llm_prompt_tokens_total")
+completion_tokens = METRICS.total("llm_completion_tokens_total")
 
 print("\nLLM usage")
 print("Total candidate pairs:", total_pairs)
-print("LLM calls made:", llm_calls)
-print("LLM calls saved:", total_pairs - llm_calls)
-print(f"Saved %: {(total_pairs - llm_calls) / total_pairs:.2%}")
-print("Total LLM tokens:", total_tokens)
+print("Pairs past the gates:", len(pairs))
+print("  cache hits:", METRICS.count("llm_cache_hits_total"))
+print("  cache misses:", METRICS.count("llm_cache_misses_total"))
+print("LLM requests made:", llm_calls)
+print("  resumed from checkpoint:", METRICS.count("checkpoint_hits_total"))
+print(f"  failed (dead-lettered to {checkpoint.dead_path}):", checkpoint.failed)
+print("Pairs decided by the cascade:", cascade_decided)
+print(f"Pairs gated (no LLM) %: {(total_pairs - len(pairs)) / total_pairs:.2%}")
+print(f"LLM tokens: {prompt_tokens} prompt + {completion_tokens} completion")
 
 # -----------------------
 # Save results
 # -----------------------
 final_df.to_csv("final_matches.csv", index=False)
+
+profiler.stop(METRICS_PATH)
+METRICS.export(METRICS_PATH)
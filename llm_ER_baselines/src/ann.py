@@ -0,0 +1,112 @@
+import numpy as np
+import scipy.sparse as sp
+
+from .retrieval import DEFAULT_CHUNK_SIZE, rerank_candidates
+
+
+class RandomProjectionIndex:
+    """
+    Approximate cosine retrieval over TF-IDF rows with random-hyperplane LSH.
+
+    Each of `n_tables` tables hashes a row to the sign pattern of `n_bits`
+    sparse random projections. A query's candidates are the rows sharing its
+    bucket in any table; with `multiprobe` the buckets one bit-flip away are
+    probed as well. Candidates are then scored exactly, so only recall is
+    approximate.
+
+    More tables / multiprobe -> higher recall, more candidates to score.
+    More bits -> smaller buckets, fewer candidates, lower recall.
+    """
+
+    def __init__(self, n_tables=32, n_bits=16, multiprobe=True, seed=42,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        if n_bits > 62:
+            raise ValueError("n_bits must fit in an int64 bucket code")
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.multiprobe = multiprobe
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    # ----------------------------------
+    # Hashing
+    # ----------------------------------
+    def _make_planes(self, n_features):
+        rng = np.random.default_rng(self.seed)
+        n_planes = self.n_tables * self.n_bits
+        density = min(1.0, 1.0 / np.sqrt(n_features))
+
+        planes = sp.random(
+            n_features, n_planes, density=density, format="csr",
+            random_state=rng, data_rvs=lambda n: rng.choice([-1.0, 1.0], size=n)
+        )
+        return planes.astype(np.float32)
+
+    def _codes(self, matrix):
+        """(n_rows, n_tables) int64 bucket codes, computed in row chunks."""
+        matrix = matrix.tocsr()
+        weights = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+        codes = np.empty((matrix.shape[0], self.n_tables), dtype=np.int64)
+
+        for start in range(0, matrix.shape[0], self.chunk_size):
+            stop = min(start + self.chunk_size, matrix.shape[0])
+            proj = (matrix[start:stop] @ self.planes).toarray()
+            bits = (proj > 0).reshape(stop - start, self.n_tables, self.n_bits)
+            codes[start:stop] = bits @ weights
+
+        return codes
+
+    # ----------------------------------
+    # Building / querying
+    # ----------------------------------
+    def fit(self, index_matrix):
+        self.index_matrix = index_matrix.tocsr()
+        self.planes = self._make_planes(index_matrix.shape[1])
+
+        codes = self._codes(self.index_matrix)
+        self.order = np.argsort(codes, axis=0, kind="stable")
+        self.sorted_codes = np.take_along_axis(codes, self.order, axis=0)
+        return self
+
+    def _probe_codes(self, codes):
+        """(n_queries, n_tables, n_variants) codes to look up."""
+        probes = codes[:, :, None]
+        if self.multiprobe:
+            flips = np.left_shift(1, np.arange(self.n_bits, dtype=np.int64))
+            probes = np.concatenate([probes, probes ^ flips], axis=2)
+        return probes
+
+    def candidates(self, query_matrix) -> list:
+        """Candidate index rows for every query (sorted, unique)."""
+        query_matrix = query_matrix.tocsr()
+        out = []
+        for start in range(0, query_matrix.shape[0], self.chunk_size):
+            out += self._chunk_candidates(query_matrix[start:start + self.chunk_size])
+        return out
+
+    def _chunk_candidates(self, query_matrix):
+        probes = self._probe_codes(self._codes(query_matrix))
+        n_queries = probes.shape[0]
+
+        lo = np.empty(probes.shape, dtype=np.int64)
+        hi = np.empty(probes.shape, dtype=np.int64)
+        for t in range(self.n_tables):
+            lo[:, t] = np.searchsorted(self.sorted_codes[:, t], probes[:, t], side="left")
+            hi[:, t] = np.searchsorted(self.sorted_codes[:, t], probes[:, t], side="right")
+
+        out = []
+        for i in range(n_queries):
+            t_idx, v_idx = np.nonzero(hi[i] > lo[i])
+            found = [
+                self.order[lo[i, t, v]:hi[i, t, v], t]
+                for t, v in zip(t_idx, v_idx)
+            ]
+            out.append(np.unique(np.concatenate(found)) if found else np.empty(0, np.int64))
+
+        return out
+
+    def query(self, query_matrix, k):
+        """Same contract as `retrieval.rerank_candidates` (padded with -1 / NaN)."""
+        return rerank_candidates(
+            query_matrix, self.index_matrix, self.candidates(query_matrix), k
+        )
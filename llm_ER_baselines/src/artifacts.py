@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+ARTIFACT_DIR = "artifacts"
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def config_digest(vectorizer, extra=None) -> str:
+    """Hash of the vectorizer parameters plus any caller config (e.g. fields)."""
+    config = {"vectorizer": vectorizer.get_params(), "extra": extra}
+    raw = json.dumps(config, sort_keys=True, default=repr)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def text_hashes(texts) -> np.ndarray:
+    """Per-row digest of the text a TF-IDF row was built from."""
+    return np.asarray(
+        [hashlib.blake2b(str(t).encode("utf-8"), digest_size=16).hexdigest() for t in texts],
+        dtype=str
+    )
+
+
+# ----------------------------------
+# Save / load one artifact directory
+# ----------------------------------
+def _save(path, vectorizer, matrix, ids, hashes, source_digest):
+    os.makedirs(path, exist_ok=True)
+    matrix = matrix.tocsr()
+
+    np.save(os.path.join(path, "idf.npy"), vectorizer.idf_)
+    np.save(os.path.join(path, "data.npy"), matrix.data)
+    np.save(os.path.join(path, "indices.npy"), matrix.indices)
+    np.save(os.path.join(path, "indptr.npy"), matrix.indptr)
+    np.save(os.path.join(path, "ids.npy"), np.asarray(ids, dtype=str))
+    np.save(os.path.join(path, "text_hashes.npy"), np.asarray(hashes, dtype=str))
+
+    with open(os.path.join(path, "vocabulary.json"), "w", encoding="utf-8") as f:
+        json.dump({term: int(i) for term, i in vectorizer.vocabulary_.items()}, f)
+
+    # written last: an artifact without meta.json is incomplete and ignored
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"shape": list(matrix.shape), "source_digest": source_digest}, f)
+
+
+def _load(path, vectorizer):
+    """Restores `vectorizer` in place and memory-maps the matrix."""
+    with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with open(os.path.join(path, "vocabulary.json"), "r", encoding="utf-8") as f:
+        vectorizer.vocabulary_ = json.load(f)
+    vectorizer.idf_ = np.load(os.path.join(path, "idf.npy"))
+
+    matrix = sp.csr_matrix(
+        (
+            np.load(os.path.join(path, "data.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "indices.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "indptr.npy"), mmap_mode="r"),
+        ),
+        shape=tuple(meta["shape"]),
+        copy=False
+    )
+    ids = np.load(os.path.join(path, "ids.npy"))
+    return matrix, ids
+
+
+def _is_complete(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+def _is_prefix(path, ids, hashes):
+    """
+    True if every row of the artifact at `path` is the leading row of
+    `ids` / `hashes` with the same id and the same text. Artifacts written
+    before text hashes were stored cannot be checked and never match.
+    """
+    hash_path = os.path.join(path, "text_hashes.npy")
+    if not os.path.exists(hash_path):
+        return False
+    old_ids = np.load(os.path.join(path, "ids.npy"))
+    n = len(old_ids)
+    return (
+        n <= len(ids)
+        and np.array_equal(old_ids, ids[:n])
+        and np.array_equal(np.load(hash_path), hashes[:n])
+    )
+
+
+# ----------------------------------
+# Public API
+# ----------------------------------
+def append_records(matrix, ids, vectorizer, new_df, text_col="serialized", id_col="id"):
+    """
+    Adds rows for new Google records without refitting: they are transformed
+    with the existing vocabulary and IDF, so terms unseen at fit time are
+    ignored. Delete the artifact to force a full refit.
+    """
+    new_rows = vectorizer.transform(new_df[text_col])
+    matrix = sp.vstack([matrix, new_rows], format="csr")
+    ids = np.concatenate([np.asarray(ids, dtype=str), new_df[id_col].to_numpy(dtype=str)])
+    return matrix, ids
+
+
+def load_or_fit(csv_path, google_df, vectorizer, text_col="serialized", id_col="id",
+                extra_config=None, root=ARTIFACT_DIR):
+    """
+    Returns the Google TF-IDF matrix for `google_df`, fitting `vectorizer`
+    only when no usable artifact exists.
+
+    Artifacts live in <root>/<config digest>/<csv digest>/. In order:
+      1. exact hit on (config, csv)      -> memory-map it
+      2. an artifact of the same config whose rows (id and text hash)
+         are a prefix of `google_df` (records were appended to the CSV;
+         a record edited in place fails the hash check)
+                                         -> load it and append the new rows
+      3. otherwise                       -> fit_transform and save
+    `vectorizer` ends up fitted in every case.
+    """
+    config_dir = os.path.join(root, config_digest(vectorizer, extra_config))
+    source = file_digest(csv_path)
+    path = os.path.join(config_dir, source)
+
+    if _is_complete(path):
+        matrix, _ = _load(path, vectorizer)
+        return matrix
+
+    google_ids = google_df[id_col].to_numpy(dtype=str)
+    hashes = text_hashes(google_df[text_col])
+
+    previous = []
+    if os.path.isdir(config_dir):
+        previous = [
+            os.path.join(config_dir, d) for d in os.listdir(config_dir)
+            if _is_complete(os.path.join(config_dir, d))
+        ]
+
+    for old_path in sorted(previous, key=os.path.getmtime, reverse=True):
+        if _is_prefix(old_path, google_ids, hashes):
+            matrix, ids = _load(old_path, vectorizer)
+            matrix, ids = append_records(
+                matrix, ids, vectorizer, google_df.iloc[len(ids):],
+                text_col=text_col, id_col=id_col
+            )
+            _save(path, vectorizer, matrix, ids, hashes, source)
+            return matrix
+
+    matrix = vectorizer.fit_transform(google_df[text_col])
+    _save(path, vectorizer, matrix, google_ids, hashes, source)
+    return matrix
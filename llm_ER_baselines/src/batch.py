@@ -0,0 +1,167 @@
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+# job states reported by every BatchClient
+PENDING = "pending"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class BatchJobFailed(RuntimeError):
+    """The backend reports the whole job as failed / expired / cancelled."""
+
+
+class BatchClient(ABC):
+    """
+    Minimal interface for offline batch-job backends.
+
+    Jobs consume a JSONL file of chat-completion requests
+    ({"custom_id", "method", "url", "body"} per line) and produce a JSONL
+    file of responses ({"custom_id", "response": {"status_code", "body"}}).
+    """
+
+    @abstractmethod
+    def submit(self, input_path: str) -> str:
+        ...
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def download(self, job_id: str, output_path: str) -> None:
+        """Writes every response line of the job, errored requests included, to `output_path`."""
+
+
+class OpenAIBatchClient(BatchClient):
+    """Backed by the OpenAI Batch API (/v1/batches)."""
+
+    def __init__(self, client, completion_window="24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, job_id):
+        state = self.client.batches.retrieve(job_id).status
+        if state == "completed":
+            return COMPLETED
+        if state in {"failed", "expired", "cancelled"}:
+            return FAILED
+        return PENDING
+
+    def download(self, job_id, output_path):
+        # successful and errored requests come back in separate files, and
+        # either id is None when the job produced no lines of that kind
+        batch = self.client.batches.retrieve(job_id)
+        with open(output_path, "w", encoding="utf-8") as f:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is None:
+                    continue
+                text = self.client.files.content(file_id).text
+                f.write(text if not text or text.endswith("\n") else text + "\n")
+
+
+# ----------------------------------
+# Local stand-in
+# ----------------------------------
+_TOKEN_RE = re.compile(r"\w+")
+_SECTION_RE = re.compile(
+    r"Amazon product:\s*(.*?)\s*Google product:\s*(.*?)\s*Rules:", re.DOTALL
+)
+
+
+def overlap_responder(body: dict, threshold: float = 0.5) -> str:
+    """
+    Deterministic offline verdict: token Jaccard between the two records in
+    a pairwise PROMPT_TEMPLATE prompt, labelled "match" above `threshold`.
+    """
+    prompt = body["messages"][-1]["content"]
+    found = _SECTION_RE.search(prompt)
+    amazon, google = found.groups() if found else (prompt, "")
+
+    a_tokens = set(_TOKEN_RE.findall(amazon.lower()))
+    g_tokens = set(_TOKEN_RE.findall(google.lower()))
+    score = len(a_tokens & g_tokens) / max(1, len(a_tokens | g_tokens))
+
+    return json.dumps({
+        "label": "match" if score >= threshold else "no_match",
+        "confidence": round(abs(score - threshold) + 0.5, 4),
+        "evidence": [f"token overlap {score:.2f}"]
+    })
+
+
+class LocalBatchClient(BatchClient):
+    """
+    File-based stand-in for tests and offline runs.
+
+    Each job is a directory under `root`. Jobs report completion once
+    `delay` seconds have passed since submission; responses are produced by
+    `responder(request_body) -> content` when the results are downloaded.
+    """
+
+    def __init__(self, root, responder=overlap_responder, delay=0.0):
+        self.root = root
+        self.responder = responder
+        self.delay = delay
+        os.makedirs(root, exist_ok=True)
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def submit(self, input_path):
+        job_id = f"local-{uuid.uuid4().hex}"
+        os.makedirs(self._job_dir(job_id))
+        shutil.copy(input_path, os.path.join(self._job_dir(job_id), "input.jsonl"))
+
+        with open(os.path.join(self._job_dir(job_id), "submitted"), "w") as f:
+            f.write(str(time.time()))
+        return job_id
+
+    def status(self, job_id):
+        marker = os.path.join(self._job_dir(job_id), "submitted")
+        if not os.path.exists(marker):
+            return FAILED
+        with open(marker) as f:
+            submitted = float(f.read())
+        return COMPLETED if time.time() - submitted >= self.delay else PENDING
+
+    def download(self, job_id, output_path):
+        input_path = os.path.join(self._job_dir(job_id), "input.jsonl")
+
+        with open(input_path, "r", encoding="utf-8") as src, \
+                open(output_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                request = json.loads(line)
+                content = self.responder(request["body"])
+                prompt_tokens = len(request["body"]["messages"][-1]["content"]) // 4
+                completion_tokens = len(content) // 4
+
+                dst.write(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"role": "assistant", "content": content}}],
+                            "usage": {
+                                "prompt_tokens": prompt_tokens,
+                                "completion_tokens": completion_tokens,
+                                "total_tokens": prompt_tokens + completion_tokens
+                            }
+                        }
+                    }
+                }) + "\n")
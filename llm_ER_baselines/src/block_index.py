@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .blocker import block_keys_frame, make_block_keys
+
+KEY_COLUMNS = ["strong", "manu", "head"]
+
+
+def _postings_from_keys(keys: pd.Series, positions: np.ndarray) -> dict:
+    """Groups record positions by key into sorted int32 posting lists."""
+    mask = keys.notna().to_numpy()
+    codes, uniques = pd.factorize(keys[mask])
+    positions = positions[mask]
+
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+    groups = np.split(positions[order].astype(np.int32), bounds)
+
+    return dict(zip(uniques, groups))
+
+
+class BlockIndex:
+    """
+    Inverted index from block keys (see `make_block_keys`) to Google records.
+
+    Posting lists are sorted int32 arrays of record positions; `ids[pos]`
+    gives the Google id. Deletions are tombstones (`alive[pos] = False`)
+    that `compact()` purges. Strong and weak keys share one key space,
+    exactly as the `google_blocks` dict expected by `get_block_candidates`.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=object)
+        self.alive = np.empty(0, dtype=bool)
+        self.postings = {}
+
+    # ----------------------------------
+    # Building
+    # ----------------------------------
+    @classmethod
+    def build(cls, google_df, text_col="serialized", id_col="id"):
+        index = cls()
+        index.insert(google_df, text_col=text_col, id_col=id_col)
+        return index
+
+    def insert(self, google_df, text_col="serialized", id_col="id"):
+        """Adds new Google records; keys for the whole batch are extracted at once."""
+        start = len(self.ids)
+        positions = np.arange(start, start + len(google_df))
+
+        keys = block_keys_frame(google_df[text_col]).reset_index(drop=True)
+
+        self.ids = np.concatenate([self.ids, google_df[id_col].to_numpy(dtype=object)])
+        self.alive = np.concatenate([self.alive, np.ones(len(google_df), dtype=bool)])
+
+        for col in KEY_COLUMNS:
+            for key, new in _postings_from_keys(keys[col], positions).items():
+                old = self.postings.get(key)
+                if old is None:
+                    self.postings[key] = new
+                else:
+                    # new positions are all larger, so the list stays sorted
+                    self.postings[key] = np.concatenate([old, new])
+
+    def delete(self, google_ids):
+        """Tombstones records by Google id; returns how many were removed."""
+        hit = np.isin(self.ids, list(google_ids)) & self.alive
+        self.alive[hit] = False
+        return int(hit.sum())
+
+    def compact(self):
+        """Drops tombstoned records and renumbers the posting lists."""
+        keep = np.flatnonzero(self.alive)
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+
+        postings = {}
+        for key, plist in self.postings.items():
+            live = remap[plist]
+            live = live[live >= 0].astype(np.int32)
+            if len(live):
+                postings[key] = live
+
+        self.ids = self.ids[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.postings = postings
+
+    # ----------------------------------
+    # Querying
+    # ----------------------------------
+    def _positions(self, key):
+        plist = self.postings.get(key)
+        if plist is None:
+            return np.empty(0, dtype=np.int32)
+        return plist[self.alive[plist]]
+
+    def get(self, key, default=None):
+        """Dict-style access: the set of live Google ids under `key`."""
+        positions = self._positions(key)
+        if len(positions) == 0:
+            return set() if default is None else default
+        return set(self.ids[positions])
+
+    def query_keys(self, strong_keys, weak_keys, min_candidates=20) -> np.ndarray:
+        """Same expansion rule as `get_block_candidates`, on positions."""
+        found = [self._positions(k) for k in strong_keys]
+        candidates = np.unique(np.concatenate(found)) if found else np.empty(0, np.int32)
+
+        if len(candidates) < min_candidates:
+            found += [self._positions(k) for k in weak_keys]
+            candidates = np.unique(np.concatenate(found)) if found else candidates
+
+        return candidates
+
+    def query(self, text: str, min_candidates=20) -> np.ndarray:
+        """Candidate Google positions for one serialized record."""
+        strong, weak = make_block_keys(text)
+        return self.query_keys(strong, weak, min_candidates)
+
+    def query_frame(self, amazon_df, text_col="serialized", min_candidates=20) -> list:
+        """Candidate Google positions for every row, with keys extracted column-wise."""
+        keys = block_keys_frame(amazon_df[text_col])
+
+        out = []
+        for strong, manu, head in keys.itertuples(index=False):
+            out.append(self.query_keys(
+                [strong] if strong is not None else [],
+                [k for k in (manu, head) if k is not None],
+                min_candidates
+            ))
+        return out
+
+    # ----------------------------------
+    # Persistence
+    # ----------------------------------
+    @staticmethod
+    def _npz_path(path):
+        """np.savez appends .npz when it is missing; load has to look there too."""
+        path = os.fspath(path)
+        return path if path.endswith(".npz") else path + ".npz"
+
+    def save(self, path):
+        """Writes the index to a compressed .npz (ids are stored as strings)."""
+        path = self._npz_path(path)
+        keys = list(self.postings)
+        lengths = np.array([len(self.postings[k]) for k in keys], dtype=np.int64)
+
+        np.savez_compressed(
+            path,
+            ids=self.ids.astype(str),
+            alive=self.alive,
+            keys=np.array(keys, dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(lengths)]),
+            postings=(
+                np.concatenate([self.postings[k] for k in keys])
+                if keys else np.empty(0, dtype=np.int32)
+            ),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(cls._npz_path(path))
+
+        index = cls()
+        index.ids = data["ids"].astype(object)
+        index.alive = data["alive"]
+
+        offsets = data["offsets"]
+        postings = data["postings"]
+        index.postings = {
+            key: postings[offsets[i]:offsets[i + 1]]
+            for i, key in enumerate(data["keys"].tolist())
+        }
+
+        return index
@@ -1,4 +1,7 @@
 import re
+from functools import lru_cache
+
+import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 
@@ -11,20 +14,30 @@ vectorizer = TfidfVectorizer(
 )
 
 
+_NUMBER_GAP_RE = re.compile(r"(\d)\s+(\d)")
+_SUFFIX_RE = re.compile(r"\b(inc|corp|corporation|ltd|limited|llc|co|company)\b|[^\w\s]")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_WS_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=None)
+def _field_re(field: str):
+    return re.compile(rf"{field}:\s*([^\n]+)", re.IGNORECASE)
+
+
 def normalize_numbers(text: str) -> str:
-    return re.sub(r"(\d)\s+(\d)", r"\1\2", text)
+    return _NUMBER_GAP_RE.sub(r"\1\2", text)
 
 
 def extract_field(text: str, field: str) -> str:
-    suffix_pattern = r"\b(inc|corp|corporation|ltd|limited|llc|co|company)\b|[^\w\s]"
-    match = re.search(rf"{field}:\s*([^\n]+)", text, re.IGNORECASE)
+    match = _field_re(field).search(text)
 
     if not match:
         return None
 
     value = match.group(1).lower().strip()
-    value = re.sub(suffix_pattern, "", value)
-    value = re.sub(r"\s+", " ", value).strip()
+    value = _SUFFIX_RE.sub("", value)
+    value = _WS_RE.sub(" ", value).strip()
     return value
 
 
@@ -33,11 +46,11 @@ def extract_name_prefix(text: str, n_tokens: int = 2) -> str:
     text = normalize_numbers(text)
 
     for field in fields:
-        match = re.search(rf"{field}:\s*([^\n]+)", text, re.IGNORECASE)
+        match = _field_re(field).search(text)
         if match:
             name = match.group(1).lower()
-            name = re.sub(r"[^\w\s]", " ", name)
-            name = re.sub(r"\s+", " ", name).strip()
+            name = _PUNCT_RE.sub(" ", name)
+            name = _WS_RE.sub(" ", name).strip()
             tokens = name.split()
             return " ".join(tokens[:n_tokens]) if tokens else None
 
@@ -63,6 +76,52 @@ def make_block_keys(text: str):
     return strong, weak
 
 
+def block_keys_frame(texts: pd.Series, n_tokens: int = 2) -> pd.DataFrame:
+    """
+    Column-wise `make_block_keys` for a whole Series of serialized records.
+
+    Returns a frame aligned with `texts` with columns:
+      strong - "manu__name prefix" key or None
+      manu   - weak manufacturer key or None
+      head   - weak first-name-token key or None
+    """
+    texts = texts.fillna("").astype(str)
+
+    manu = texts.str.extract(_field_re("manufacturer"), expand=False)
+    manu = (
+        manu.str.lower().str.strip()
+        .str.replace(_SUFFIX_RE, "", regex=True)
+        .str.replace(_WS_RE, " ", regex=True)
+        .str.strip()
+    )
+
+    numbered = texts.str.replace(_NUMBER_GAP_RE, r"\1\2", regex=True)
+    name = numbered.str.extract(_field_re("name"), expand=False)
+    name = name.where(
+        name.notna(), numbered.str.extract(_field_re("title"), expand=False)
+    )
+    tokens = (
+        name.str.lower()
+        .str.replace(_PUNCT_RE, " ", regex=True)
+        .str.replace(_WS_RE, " ", regex=True)
+        .str.strip()
+        .str.split()
+    )
+    prefix = tokens.str[:n_tokens].str.join(" ")
+    head = tokens.str[0]
+
+    # empty strings are "no key", exactly as in make_block_keys
+    manu = manu.where(manu.str.len() > 0)
+    prefix = prefix.where(prefix.str.len() > 0)
+    head = head.where(prefix.notna())
+
+    strong = (manu + "__" + prefix).where(manu.notna() & prefix.notna())
+
+    return pd.DataFrame({
+        "strong": strong, "manu": manu, "head": head
+    }, index=texts.index).astype(object).where(lambda df: df.notna(), None)
+
+
 def get_block_candidates(amazon_row, google_blocks, min_candidates=20):
     strong_keys, weak_keys = make_block_keys(amazon_row["serialized"])
 
@@ -1,15 +1,116 @@
+import atexit
 import json
 import os
+import sqlite3
+import threading
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-CACHE_PATH = os.path.join(BASE_DIR, "llm_cache.json")
+CACHE_PATH = os.path.join(BASE_DIR, "llm_cache.json")        # legacy, imported once
+CACHE_DB_PATH = os.path.join(BASE_DIR, "llm_cache.sqlite")
+
+
+class SQLiteCache:
+    """
+    Dict-like LLM response cache stored in SQLite (WAL mode).
+
+    Every `set_many` call (and so every `cache[key] = value`) is one short
+    explicit transaction, committed before it returns: with WAL a commit
+    is an append to the log, and no write lock is held between calls. Any
+    number of processes can read while one of them writes; writers from
+    other processes wait up to `timeout` seconds for the lock, which is
+    only ever held for the duration of one insert.
+
+    Values are JSON-serializable dicts. A legacy JSON cache file is imported
+    the first time an empty database is opened.
+    """
+
+    def __init__(self, path, legacy_json=None, timeout=30.0):
+        self.path = path
+        self._lock = threading.RLock()
+
+        # one connection per process, shared by its threads under self._lock;
+        # autocommit mode, so transactions are exactly the explicit ones below
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+        if legacy_json and os.path.exists(legacy_json) and len(self) == 0:
+            self._import_json(legacy_json)
+
+        atexit.register(self.close)
+
+    def _import_json(self, json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+
+        self._write(
+            "INSERT OR IGNORE INTO cache (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in legacy.items()]
+        )
+
+    # ----------------------------------
+    # Mapping interface
+    # ----------------------------------
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __setitem__(self, key, value):
+        self.set_many([(key, value)])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def set_many(self, items):
+        """Inserts or replaces several (key, value) pairs in one committed transaction."""
+        rows = [(k, json.dumps(v)) for k, v in items]
+        if rows:
+            self._write("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", rows)
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(sql, rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ----------------------------------
+    # Durability
+    # ----------------------------------
+    def flush(self):
+        """Nothing to do: writes are committed as they are made."""
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.close()
+            self._conn = None
+
 
 def load_cache():
-    if os.path.exists(CACHE_PATH):
-        with open(CACHE_PATH, "r") as f:
-            return json.load(f)
-    return {}
+    return SQLiteCache(CACHE_DB_PATH, legacy_json=CACHE_PATH)
 
 def save_cache(cache):
-    with open(CACHE_PATH, "w") as f:
-        json.dump(cache, f, indent=2)
\ No newline at end of file
+    """No-op kept for callers of the old JSON cache: every write is committed as it is made."""
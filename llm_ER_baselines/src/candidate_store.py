@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .constants import AMAZON_ID_COL, GOOGLE_ID_COL
+
+
+def _write_strings(path, values):
+    """Stores strings as one UTF-8 blob plus an int64 offsets array."""
+    encoded = [str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    with open(path + ".bin", "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(path + ".offsets.npy", offsets)
+
+
+class _StringColumn:
+    """Memory-mapped view of a column written by `_write_strings`."""
+
+    def __init__(self, path):
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        if self.offsets[-1] > 0:
+            self.blob = np.memmap(path + ".bin", dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.empty(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def take(self, positions):
+        return [self[i] for i in positions]
+
+
+class RecordTable:
+    """
+    Deduplicated id -> serialized text table for one side of the match.
+
+    Each record is stored once; candidate rows refer to it by position.
+    Text is decoded lazily, only for the positions that are asked for.
+    """
+
+    def __init__(self, path):
+        self.ids = _StringColumn(path + ".ids")
+        self.text = _StringColumn(path + ".text")
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def write(path, ids, texts):
+        _write_strings(path + ".ids", ids)
+        _write_strings(path + ".text", texts)
+
+    def all_ids(self) -> np.ndarray:
+        return np.array(self.ids.take(range(len(self))), dtype=object)
+
+    def texts(self, positions) -> list:
+        return self.text.take(positions)
+
+    def texts_for(self, ids) -> list:
+        """Serialized text per id; None for ids not in the table."""
+        positions = pd.Index(self.all_ids()).get_indexer(list(ids))
+        return [self.text[p] if p >= 0 else None for p in positions]
+
+
+class CandidateStore:
+    """
+    Columnar candidate pairs: int32 record positions, int16 rank and
+    float64 TF-IDF score as memory-mapped .npy files, plus one RecordTable
+    per side. Replaces candidates.csv, which repeated the Amazon text on
+    every one of its TOP_K rows. Scores keep full precision so that the
+    HIGH_CONF / LOW_CONF gates split them exactly as the float64 scores
+    they were computed as.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.amazon_idx = np.load(os.path.join(root, "amazon_idx.npy"), mmap_mode="r")
+        self.google_idx = np.load(os.path.join(root, "google_idx.npy"), mmap_mode="r")
+        self.rank = np.load(os.path.join(root, "rank.npy"), mmap_mode="r")
+        self.score = np.load(os.path.join(root, "score.npy"), mmap_mode="r")
+        self.amazon = RecordTable(os.path.join(root, "amazon"))
+        self.google = RecordTable(os.path.join(root, "google"))
+
+    def __len__(self):
+        return len(self.rank)
+
+    @staticmethod
+    def write(root, amazon_df, google_df, amazon_idx, google_idx, rank, score,
+              text_col="serialized", id_col="id"):
+        """
+        Writes candidate pairs given as positions into `amazon_df` /
+        `google_df`. Only records referenced by at least one candidate are
+        kept in the record tables.
+        """
+        os.makedirs(root, exist_ok=True)
+
+        tables = {}
+        for side, df, idx in (("amazon", amazon_df, amazon_idx), ("google", google_df, google_idx)):
+            used, remapped = np.unique(idx, return_inverse=True)
+            RecordTable.write(
+                os.path.join(root, side),
+                df[id_col].to_numpy()[used],
+                df[text_col].to_numpy()[used]
+            )
+            tables[side] = remapped.astype(np.int32)
+
+        np.save(os.path.join(root, "amazon_idx.npy"), tables["amazon"])
+        np.save(os.path.join(root, "google_idx.npy"), tables["google"])
+        np.save(os.path.join(root, "rank.npy"), np.asarray(rank, dtype=np.int16))
+        np.save(os.path.join(root, "score.npy"), np.asarray(score, dtype=np.float64))
+
+    def frame(self) -> pd.DataFrame:
+        """Candidate rows with ids, rank and score; no record text."""
+        return pd.DataFrame({
+            AMAZON_ID_COL: self.amazon.all_ids()[self.amazon_idx],
+            GOOGLE_ID_COL: self.google.all_ids()[self.google_idx],
+            "rank": np.asarray(self.rank),
+            "tfidf_score": np.asarray(self.score, dtype=np.float64),
+        })
+
+    def pair_texts(self, rows) -> list:
+        """(amazon_serialized, google_serialized) for the given candidate rows."""
+        return list(zip(
+            self.amazon.texts(self.amazon_idx[rows]),
+            self.google.texts(self.google_idx[rows])
+        ))
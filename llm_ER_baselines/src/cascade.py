@@ -0,0 +1,203 @@
+import re
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .blocker import block_keys_frame
+from .scheduler import ScoreCalibration
+
+DEFAULT_CHUNK_SIZE = 65536
+
+FEATURE_NAMES = [
+    "char_cosine",        # char_wb 2-3 gram TF-IDF, as in retrieval
+    "word_cosine",        # word 1-2 gram TF-IDF
+    "token_jaccard",      # distinct word tokens
+    "title_jaccard",      # title / name tokens only
+    "manufacturer_equal",
+    "manufacturer_missing",
+    "number_overlap",     # digit-bearing tokens (model numbers, versions, sizes), over the smaller set
+    "number_missing",     # either side has no digit-bearing token
+    "length_ratio",       # shorter / longer, in tokens
+    "title_length_ratio",
+]
+
+_TITLE_RE = re.compile(r"^(?:title|name):[ \t]*([^\n]*)", re.MULTILINE)
+_TOKEN_PATTERN = r"(?u)\b\w+\b"
+_NUMBER_TOKEN_PATTERN = r"(?u)\b\w*\d\w*\b"
+
+
+def _hashing(token_pattern):
+    """Stateless binary token sets: nothing to fit, same columns for both sides."""
+    return HashingVectorizer(
+        token_pattern=token_pattern, n_features=1 << 20,
+        binary=True, norm=None, alternate_sign=False
+    )
+
+
+def _aligned_cosine(left, right):
+    """Row-wise cosine of two L2-normalized CSR matrices with aligned rows."""
+    return np.asarray(left.multiply(right).sum(axis=1)).ravel()
+
+
+def _jaccard(left, right):
+    """Row-wise Jaccard of two binary CSR matrices; also returns both set sizes."""
+    inter = np.asarray(left.multiply(right).sum(axis=1)).ravel()
+    n_left = np.asarray(left.sum(axis=1)).ravel()
+    n_right = np.asarray(right.sum(axis=1)).ravel()
+    union = n_left + n_right - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0), inter, n_left, n_right
+
+
+def _ratio(a, b):
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    return np.divide(lo, hi, out=np.zeros_like(lo, dtype=float), where=hi > 0)
+
+
+class PairFeatures:
+    """
+    Vectorized features for (amazon_serialized, google_serialized) pairs.
+
+    Only the two TF-IDF vectorizers are fitted; token sets use a stateless
+    hashing vectorizer. Pairs are featurized `chunk_size` rows at a time,
+    and each distinct record in a chunk is vectorized once (candidate pairs
+    repeat the same records many times).
+    """
+
+    names = FEATURE_NAMES
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.char_vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 3), min_df=2)
+        self.word_vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True)
+        self.tokens = _hashing(_TOKEN_PATTERN)
+        self.numbers = _hashing(_NUMBER_TOKEN_PATTERN)
+
+    def fit(self, texts):
+        """Fits the TF-IDF vocabularies on record texts from both sides."""
+        texts = pd.Series(list(texts), dtype=object).fillna("").astype(str).unique()
+        self.char_vectorizer.fit(texts)
+        self.word_vectorizer.fit(texts)
+        return self
+
+    def transform(self, amazon_texts, google_texts) -> np.ndarray:
+        amazon_texts = pd.Series(list(amazon_texts), dtype=object).fillna("").astype(str)
+        google_texts = pd.Series(list(google_texts), dtype=object).fillna("").astype(str)
+
+        out = np.empty((len(amazon_texts), len(self.names)), dtype=np.float64)
+        for start in range(0, len(out), self.chunk_size):
+            stop = start + self.chunk_size
+            out[start:stop] = self._chunk(
+                amazon_texts.iloc[start:stop], google_texts.iloc[start:stop]
+            )
+        return out
+
+    def _records(self, texts):
+        """Per-record vectors, computed once per distinct text; returns (codes, vectors)."""
+        codes, uniques = pd.factorize(texts)
+        uniques = pd.Series(uniques, dtype=object)
+        titles = uniques.str.extract(_TITLE_RE, expand=False).fillna("")
+        return codes, {
+            "char": self.char_vectorizer.transform(uniques),
+            "word": self.word_vectorizer.transform(uniques),
+            "tokens": self.tokens.transform(uniques),
+            "title": self.tokens.transform(titles),
+            "numbers": self.numbers.transform(uniques),
+            # same cleaning as extract_field, column-wise
+            "manu": block_keys_frame(uniques)["manu"].to_numpy(),
+        }
+
+    def _chunk(self, a, g):
+        a_codes, a_vec = self._records(a)
+        g_codes, g_vec = self._records(g)
+
+        def pair(name):
+            return a_vec[name][a_codes], g_vec[name][g_codes]
+
+        char = _aligned_cosine(*pair("char"))
+        word = _aligned_cosine(*pair("word"))
+        token_jaccard, _, a_len, g_len = _jaccard(*pair("tokens"))
+        title_jaccard, _, a_title_len, g_title_len = _jaccard(*pair("title"))
+
+        a_manu, g_manu = pair("manu")
+        manu_missing = pd.isna(a_manu) | pd.isna(g_manu)
+        manu_equal = ~manu_missing & (a_manu == g_manu)
+
+        _, num_inter, a_num, g_num = _jaccard(*pair("numbers"))
+        num_smaller = np.minimum(a_num, g_num)
+        num_overlap = np.divide(num_inter, num_smaller, out=np.zeros_like(num_inter), where=num_smaller > 0)
+
+        return np.column_stack([
+            char, word, token_jaccard, title_jaccard,
+            manu_equal, manu_missing,
+            num_overlap, num_smaller == 0,
+            _ratio(a_len, g_len), _ratio(a_title_len, g_title_len),
+        ])
+
+
+def make_model(kind="logistic"):
+    if kind == "logistic":
+        return make_pipeline(StandardScaler(), LogisticRegression(C=1.0, max_iter=1000))
+    if kind == "gbdt":
+        return HistGradientBoostingClassifier(max_iter=200, learning_rate=0.1, random_state=42)
+    raise ValueError(f"Unknown cascade model: {kind}")
+
+
+class LocalCascade:
+    """
+    Cheap pair classifier between the TF-IDF gates and the LLM.
+
+    Pairs with P(match) >= `calibration.high` are accepted, <= `calibration.low`
+    rejected, locally; the ambiguous middle is left for the LLM. Thresholds
+    are fitted on a held-out part of the training pairs with
+    `ScoreCalibration.fit`.
+    """
+
+    def __init__(self, kind="logistic", features=None):
+        self.features = features or PairFeatures()
+        self.model = make_model(kind)
+        self.calibration = None
+
+    def fit(self, amazon_texts, google_texts, labels, groups=None, corpus=None,
+            holdout=0.25, target_precision=0.98, max_miss_rate=0.01, seed=42):
+        """
+        Trains on labelled pairs (e.g. `generate_gold_df`) and calibrates the
+        local accept / reject thresholds on a `holdout` share of them. With
+        `groups` (e.g. Amazon ids) the split keeps each group on one side.
+        The TF-IDF vocabularies are fitted on `corpus` (default: the
+        training texts).
+        """
+        amazon_texts, google_texts = list(amazon_texts), list(google_texts)
+        labels = np.asarray(labels, dtype=int)
+        self.features.fit(amazon_texts + google_texts if corpus is None else corpus)
+        X = self.features.transform(amazon_texts, google_texts)
+
+        rng = np.random.default_rng(seed)
+        if groups is not None:
+            codes, uniques = pd.factorize(pd.Series(list(groups), dtype=object))
+            held = rng.random(len(uniques)) < holdout
+            is_held = held[codes]
+        else:
+            is_held = rng.random(len(labels)) < holdout
+
+        self.model.fit(X[~is_held], labels[~is_held])
+        self.calibration = ScoreCalibration.fit(
+            self.model.predict_proba(X[is_held])[:, 1], labels[is_held],
+            target_precision=target_precision, max_miss_rate=max_miss_rate
+        )
+        return self
+
+    def predict_proba(self, amazon_texts, google_texts) -> np.ndarray:
+        return self.model.predict_proba(self.features.transform(amazon_texts, google_texts))[:, 1]
+
+    def decide(self, probabilities):
+        """ "match" / "no_match" where the classifier is confident, None where the LLM should decide."""
+        probabilities = np.asarray(probabilities, dtype=float)
+        labels = np.full(len(probabilities), None, dtype=object)
+        labels[probabilities >= self.calibration.high] = "match"
+        labels[probabilities <= self.calibration.low] = "no_match"
+        return labels
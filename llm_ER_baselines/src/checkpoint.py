@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+
+
+def _json_default(value):
+    """numpy scalars (ids, counts read from frames) as plain Python values."""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Not JSON serializable: {type(value).__name__}")
+
+
+def _load_jsonl(path):
+    """
+    Records of an append-only JSONL file. A partial last line (the process
+    died mid-write) is cut off so that appends start on a clean line.
+    """
+    if not os.path.exists(path):
+        return []
+
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+    return [json.loads(line) for line in data[:end].decode("utf-8").splitlines() if line.strip()]
+
+
+class Checkpoint:
+    """
+    Append-only progress of one verification run.
+
+    <path>.results.jsonl - one {"key", "result"} line per completed pair
+    <path>.dead.jsonl    - one line per pair that failed after retries,
+                           with the error and the raw response
+
+    Every line is flushed as it is written. With `resume`, completed keys
+    are loaded and `get` serves them so the run skips that work; failed
+    pairs are not considered done and are tried again. Without `resume`
+    both files start empty.
+    """
+
+    def __init__(self, path, resume=False):
+        self.results_path = path + ".results.jsonl"
+        self.dead_path = path + ".dead.jsonl"
+        os.makedirs(os.path.dirname(self.results_path) or ".", exist_ok=True)
+
+        self.done = {}
+        if resume:
+            for record in _load_jsonl(self.results_path):
+                self.done[record["key"]] = record["result"]
+            _load_jsonl(self.dead_path)   # only to cut off a partial last line
+        self.resumed = len(self.done)
+
+        mode = "a" if resume else "w"
+        self._results = open(self.results_path, mode, encoding="utf-8")
+        self._dead = open(self.dead_path, mode, encoding="utf-8")
+        self._lock = threading.Lock()
+        self.failed = 0
+
+    def get(self, key):
+        return self.done.get(key)
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def _write(self, f, record):
+        line = json.dumps(record, default=_json_default) + "\n"
+        with self._lock:
+            f.write(line)
+            f.flush()
+
+    def append(self, key, result):
+        self.done[key] = result
+        self._write(self._results, {"key": key, "result": result})
+
+    def dead_letter(self, key, error, raw=None, **context):
+        """Records a failed pair; `context` holds whatever is needed to replay it."""
+        with self._lock:
+            self.failed += 1
+        self._write(self._dead, {
+            "key": key,
+            "error": f"{type(error).__name__}: {error}",
+            "raw": raw if raw is not None else getattr(error, "raw", None),
+            "time": time.time(),
+            **context
+        })
+
+    def close(self):
+        with self._lock:
+            self._results.close()
+            self._dead.close()
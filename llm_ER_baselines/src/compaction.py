@@ -0,0 +1,172 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from .constants import PROMPT_TEMPLATE
+
+# Per-field token budgets for serialized records ("field: value" lines).
+# Fields without a budget are left as they are.
+FIELD_TOKEN_BUDGETS = {
+    "title": 32,
+    "name": 32,
+    "manufacturer": 8,
+    "description": 48,
+}
+
+# free-text fields: boilerplate and words already present in the record's
+# other fields are dropped before the budget is applied
+FREE_TEXT_FIELDS = frozenset({"description"})
+
+BOILERPLATE = frozenset("""
+a an the and or of for with to in on at by from as is are be been it its this that these
+those your you our we us all any more most new best great free shipping ships ship includes
+include including included features feature easy use using used also can will just one
+get like only plus now high quality perfect ideal design designed provides provide allows
+""".split())
+
+_FIELD_LINE_RE = re.compile(r"^(\w+): ?(.*)$")
+_PIECE_RE = re.compile(r"[^\W\d_]+|\d+|\S")
+_IDENTIFIER_RE = re.compile(r"\d")   # model numbers, versions, sizes: any token with a digit
+
+
+# ----------------------------------
+# Token estimate
+# ----------------------------------
+@lru_cache(maxsize=1 << 16)
+def _word_tokens(word: str) -> int:
+    """
+    BPE-style cost of one whitespace-separated word: letter runs cost one
+    token per 8 characters (common words are single tokens), digit runs one
+    per 3 digits, any other character one each.
+    """
+    n = 0
+    for piece in _PIECE_RE.findall(word):
+        if piece.isdigit():
+            n += (len(piece) + 2) // 3
+        elif piece.isalpha():
+            n += 1 + (len(piece) - 1) // 8
+        else:
+            n += 1
+    return n
+
+
+def count_tokens(text: str) -> int:
+    """Local prompt-token estimate (no tokenizer download); newlines count as one token."""
+    return sum(_word_tokens(w) for w in text.split()) + text.count("\n")
+
+
+# ----------------------------------
+# Compaction
+# ----------------------------------
+def is_identifier(word: str) -> bool:
+    return _IDENTIFIER_RE.search(word) is not None
+
+
+def compact_value(value: str, budget: int, free_text=False, context=frozenset()) -> str:
+    """
+    Shrinks one normalized field value to at most `budget` estimated tokens.
+
+    Repeated words are dropped; in free text so are boilerplate words and
+    words already present in `context` (the record's other fields). If the
+    rest still exceeds the budget, identifier-like words are kept first,
+    then the remaining budget goes to the other words in their original
+    order. Kept words stay in their original order.
+    """
+    seen = set()
+    words = []
+    for w in value.split():
+        if w in seen or (free_text and (w in BOILERPLATE or w in context)):
+            continue
+        seen.add(w)
+        words.append(w)
+
+    costs = [_word_tokens(w) for w in words]
+    if sum(costs) <= budget:
+        return " ".join(words)
+
+    keep = [False] * len(words)
+    left = budget
+    for pass_identifiers in (True, False):
+        for i, (w, cost) in enumerate(zip(words, costs)):
+            if keep[i] or is_identifier(w) != pass_identifiers:
+                continue
+            if cost <= left:
+                keep[i] = True
+                left -= cost
+
+    return " ".join(w for w, k in zip(words, keep) if k)
+
+
+class PromptCompactor:
+    """
+    Applies per-field token budgets to serialized records, memoized per
+    distinct record text (candidate pairs repeat the same records).
+    """
+
+    def __init__(self, budgets=None):
+        self.budgets = dict(FIELD_TOKEN_BUDGETS if budgets is None else budgets)
+        self._memo = {}
+
+    def compact(self, text: str) -> str:
+        out = self._memo.get(text)
+        if out is None:
+            out = self._memo[text] = self._compact(text)
+        return out
+
+    def _compact(self, text):
+        lines = text.split("\n")
+        parsed = [_FIELD_LINE_RE.match(line) for line in lines]
+
+        context = set()
+        for m in parsed:
+            if m and m.group(1) not in FREE_TEXT_FIELDS:
+                context.update(m.group(2).split())
+
+        out = []
+        for line, m in zip(lines, parsed):
+            if m is None or m.group(1) not in self.budgets:
+                out.append(line)
+                continue
+            field, value = m.groups()
+            value = compact_value(
+                value, self.budgets[field],
+                free_text=field in FREE_TEXT_FIELDS, context=context
+            )
+            out.append(f"{field}: {value}")
+        return "\n".join(out)
+
+    def compact_pairs(self, pairs) -> list:
+        return [(self.compact(a), self.compact(g)) for a, g in pairs]
+
+
+def compaction_report(pairs, compacted, template=PROMPT_TEMPLATE) -> dict:
+    """Estimated prompt tokens per pairwise call before / after compaction."""
+    # records are substituted between whitespace, so a prompt's estimate is
+    # the template's plus its two records'
+    base = count_tokens(template.format(amazon_record="", google_record=""))
+    memo = {}
+
+    def record_tokens(text):
+        n = memo.get(text)
+        if n is None:
+            n = memo[text] = count_tokens(text)
+        return n
+
+    def prompt_tokens(batch):
+        return np.array([base + record_tokens(a) + record_tokens(g) for a, g in batch])
+
+    before, after = prompt_tokens(pairs), prompt_tokens(compacted)
+    if len(before) == 0:
+        return {"pairs": 0}
+
+    return {
+        "pairs": len(before),
+        "total_before": int(before.sum()),
+        "total_after": int(after.sum()),
+        "mean_before": float(before.mean()),
+        "mean_after": float(after.mean()),
+        "p95_before": float(np.percentile(before, 95)),
+        "p95_after": float(np.percentile(after, 95)),
+        "reduction": float(1.0 - after.sum() / max(before.sum(), 1)),
+    }
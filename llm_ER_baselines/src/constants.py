@@ -2,6 +2,11 @@ AMAZON_ID_COL = "idAmazon"
 GOOGLE_ID_COL = "idGoogleBase"
 THRESHOLD = 0.4
 
+# TF-IDF score gates for LLM verification: at or above HIGH_CONF is accepted
+# as a match, at or below LOW_CONF rejected, anything between goes to the LLM
+HIGH_CONF = 0.90
+LOW_CONF = 0.30
+
 AMAZON_PATH = "./dataset/Amazon-GoogleProducts/Amazon.csv"
 AMAZON_FIELDS = ["title", "description", "manufacturer"]
 
@@ -35,4 +40,34 @@ Output format:
     "short reason 2"
   ]
 }}
-"""
\ No newline at end of file
+"""
+
+LISTWISE_PROMPT_TEMPLATE = """
+You are an expert in product entity resolution.
+
+For EACH numbered Google candidate below, determine whether it refers to the SAME real-world product as the Amazon product.
+
+Amazon product:
+{amazon_record}
+
+Google candidates:
+{google_candidates}
+
+Rules:
+- Answer ONLY with valid JSON
+- Do NOT include any extra text
+- Return exactly one entry per candidate, using its number as "index"
+- Decide strictly between "match" or "no_match" for each candidate
+
+Output format:
+{{
+  "results": [
+    {{
+      "index": 1,
+      "label": "match" or "no_match",
+      "confidence": a number between 0 and 1,
+      "evidence": ["short reason"]
+    }}
+  ]
+}}
+"""
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+class StopRule:
+    """
+    When to stop walking one Amazon record's candidates in rank order.
+
+    max_matches             - stop after this many matches with confidence
+                              >= `match_confidence` (gate accepts count as
+                              confidence 1.0); 1 for one-to-one style runs,
+                              None to never stop on matches
+    max_consecutive_rejects - stop after this many no_match verdicts in a
+                              row (gate rejects included); None to disable
+    """
+
+    def __init__(self, match_confidence=0.9, max_matches=1, max_consecutive_rejects=None):
+        self.match_confidence = match_confidence
+        self.max_matches = max_matches
+        self.max_consecutive_rejects = max_consecutive_rejects
+
+    def update(self, state, label, confidence):
+        """Folds one verdict into `state` ([matches, rejects_in_a_row]); returns the stop reason or None."""
+        if label == "match":
+            state[1] = 0
+            if confidence is not None and confidence >= self.match_confidence:
+                state[0] += 1
+                if self.max_matches is not None and state[0] >= self.max_matches:
+                    return "match"
+        else:
+            state[1] += 1
+            if self.max_consecutive_rejects is not None and state[1] >= self.max_consecutive_rejects:
+                return "rejects"
+        return None
+
+
+def verify_ranked(amazon_ids, ranks, gate_labels, verify_fn, rule):
+    """
+    Verifies candidates record by record in `rank` order, stopping each
+    record as soon as `rule` fires.
+
+    amazon_ids / ranks / gate_labels - one entry per candidate row;
+        gate_labels is "match" / "no_match" for gated rows, None for rows
+        that need the LLM
+    verify_fn(rows) -> outputs for those row positions (`call_llm` schema;
+        None for a failed verification, which moves the record on without
+        counting towards its stop rule)
+
+    Records advance in lock-step rounds: each round sends the next
+    uncertain candidate of every still-active record in one `verify_fn`
+    call, so requests stay concurrent across records.
+
+    Returns (outputs, stats): outputs maps every uncertain row to its
+    verdict, or to None when the record stopped before reaching it.
+    """
+    frame = pd.DataFrame({"amazon": list(amazon_ids), "rank": np.asarray(ranks)})
+    order = frame.sort_values(["amazon", "rank"], kind="stable").index.to_numpy()
+    codes = pd.factorize(frame["amazon"].to_numpy()[order])[0]
+    bounds = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1], True])
+    groups = [order[s:e] for s, e in zip(bounds[:-1], bounds[1:])]
+
+    outputs = {row: None for row, gate in enumerate(gate_labels) if gate is None}
+    stats = {"verified": 0, "skipped": 0, "stopped_on_match": 0, "stopped_on_rejects": 0}
+
+    cursors = [0] * len(groups)
+    states = [[0, 0] for _ in groups]
+    active = list(range(len(groups)))
+
+    def stop(g, reason):
+        stats[f"stopped_on_{reason}"] += 1
+        rest = groups[g][cursors[g]:]
+        stats["skipped"] += sum(1 for row in rest if gate_labels[row] is None)
+
+    while active:
+        # advance every record through its gated rows up to the next uncertain one
+        pending = []
+        for g in active:
+            rows = groups[g]
+            reason = None
+            while cursors[g] < len(rows) and gate_labels[rows[cursors[g]]] is not None:
+                reason = rule.update(states[g], gate_labels[rows[cursors[g]]], 1.0)
+                cursors[g] += 1
+                if reason:
+                    break
+            if reason:
+                stop(g, reason)
+            elif cursors[g] < len(rows):
+                pending.append(g)
+
+        if not pending:
+            break
+
+        rows = [groups[g][cursors[g]] for g in pending]
+        active = []
+        for g, row, out in zip(pending, rows, verify_fn(rows)):
+            outputs[row] = out
+            stats["verified"] += 1
+            cursors[g] += 1
+            reason = None if out is None else rule.update(states[g], out["label"], out["confidence"])
+            if reason:
+                stop(g, reason)
+            else:
+                active.append(g)
+
+    return outputs, stats
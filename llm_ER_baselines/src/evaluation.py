@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from .constants import AMAZON_ID_COL, GOOGLE_ID_COL
+
+RECALL_KS = [5, 10, 20, 50]
+PAIR_KEY = [AMAZON_ID_COL, GOOGLE_ID_COL]
+
+
+def best_rank(candidates_df, gold_df, rank_col="rank") -> np.ndarray:
+    """
+    For every gold row, the smallest `rank_col` at which its (amazon, google)
+    pair appears in `candidates_df`; NaN when it never appears.
+    """
+    ranks = (
+        candidates_df[PAIR_KEY + [rank_col]]
+        .groupby(PAIR_KEY, sort=False)[rank_col]
+        .min()
+        .reset_index()
+    )
+    merged = gold_df[PAIR_KEY].merge(ranks, on=PAIR_KEY, how="left")
+    return merged[rank_col].to_numpy(dtype=float)
+
+
+def recall_at_k(candidates_df, gold_df, ks=RECALL_KS, rank_col="rank") -> dict:
+    """
+    Recall@K for every K in `ks` from a single merge: a gold pair is a hit
+    at K when its best rank is <= K. Every gold row counts once.
+    """
+    if len(gold_df) == 0:
+        return {k: 0.0 for k in ks}
+
+    ranks = best_rank(candidates_df, gold_df, rank_col)
+    return {k: float(np.sum(ranks <= k)) / len(gold_df) for k in ks}
+
+
+def recall_at_k_verified(final_df, gold_df, ks=RECALL_KS) -> dict:
+    """
+    Recall@K after verification: K counts accepted matches per Amazon record
+    in rank order, so a gold pair is a hit when it is among the first K
+    candidates labelled "match". Duplicate gold pairs count once.
+    """
+    matched = final_df[final_df["label"] == "match"].sort_values(
+        [AMAZON_ID_COL, "rank"], kind="stable"
+    )
+    matched = matched.assign(
+        match_rank=matched.groupby(AMAZON_ID_COL).cumcount() + 1
+    )
+    gold = pd.DataFrame(gold_df[PAIR_KEY]).drop_duplicates()
+    return recall_at_k(matched, gold, ks, rank_col="match_rank")
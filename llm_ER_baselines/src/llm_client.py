@@ -0,0 +1,50 @@
+import os
+import threading
+
+from openai import OpenAI
+
+# Any OpenAI-compatible endpoint works, e.g. the local stand-in:
+#   OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python run_verification.py
+BASE_URL_ENV = "OPENAI_BASE_URL"
+LOCAL_API_KEY = "local"   # placeholder key for endpoints that ignore it
+
+_lock = threading.Lock()
+_clients = {}
+_override = None
+
+
+def make_client(base_url=None, api_key=None, **kwargs) -> OpenAI:
+    """
+    Builds a client for `base_url` (default: $OPENAI_BASE_URL, else the
+    OpenAI API). A custom endpoint does not require OPENAI_API_KEY.
+    """
+    base_url = base_url or os.getenv(BASE_URL_ENV) or None
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if base_url and not api_key:
+        api_key = LOCAL_API_KEY
+    return OpenAI(api_key=api_key, base_url=base_url, **kwargs)
+
+
+def get_client(max_retries: int = 2):
+    """
+    Process-wide client, constructed on first use rather than at import so
+    that importing the verification code needs no credentials or network.
+    One client is kept per `max_retries` setting.
+    """
+    if _override is not None:
+        return _override
+
+    with _lock:
+        if max_retries not in _clients:
+            _clients[max_retries] = make_client(max_retries=max_retries)
+        return _clients[max_retries]
+
+
+def set_client(client):
+    """
+    Plugs in any object exposing the OpenAI client surface used here
+    (`chat.completions.create`, plus `files` / `batches` for batch jobs).
+    None restores the default.
+    """
+    global _override
+    _override = client
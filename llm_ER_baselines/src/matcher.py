@@ -1,10 +1,13 @@
-from openai import OpenAI
 from .constants import *
 import time
 import json
 from .cache import *
+from .llm_client import get_client
+from .metrics import METRICS
+from .response_parsing import STRICT_SUFFIX, VerificationError, parse_json
+
+PARSE_RETRIES = 2   # re-requests after an unusable response
 
-client = OpenAI()
 llm_cache = load_cache()
 
 def llm_match(amazon_text, google_text):
@@ -15,25 +18,41 @@ def llm_match(amazon_text, google_text):
 
     start = time.time()
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",   # cheap + fast 
-        messages=[
-            {"role": "system", "content": "You are an expert entity resolution system."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0
-    )
+    # an unusable answer is re-requested with a stricter instruction
+    for attempt in range(PARSE_RETRIES + 1):
+        request_start = time.time()
+        response = get_client().chat.completions.create(
+            model="gpt-4o-mini",   # cheap + fast 
+            messages=[
+                {"role": "system", "content": "You are an expert entity resolution system."},
+                {"role": "user", "content": prompt if attempt == 0 else prompt + STRICT_SUFFIX}
+            ],
+            temperature=0
+        )
 
-    latency = time.time() - start
+        METRICS.observe("llm_request_seconds", time.time() - request_start, mode="direct")
+        METRICS.inc("llm_calls_total", mode="direct")
+        METRICS.inc("llm_prompt_tokens_total", response.usage.prompt_tokens, mode="direct")
+        METRICS.inc("llm_completion_tokens_total", response.usage.completion_tokens, mode="direct")
 
-    content = response.choices[0].message.content
+        content = response.choices[0].message.content
 
-    result = json.loads(content)
+        try:
+            result = parse_json(content)
+            if result.get("label") not in {"match", "no_match"}:
+                raise VerificationError(f"Invalid label: {result.get('label')}", raw=content)
+            break
+        except VerificationError:
+            METRICS.inc("llm_parse_failures_total", mode="direct")
+            if attempt == PARSE_RETRIES:
+                raise
+
+    latency = time.time() - start
 
     return {
         "label": result["label"],
-        "confidence": result["confidence"],
-        "evidence": result["evidence"],
+        "confidence": result.get("confidence", 0.0),
+        "evidence": result.get("evidence", []),
         "latency": latency,
         "tokens": response.usage.total_tokens
     }
@@ -42,13 +61,15 @@ def llm_match_cached(amazon_id, google_id, amazon_text, google_text):
     key = f"{amazon_id}||{google_id}"
 
     # cache hit
-    if key in llm_cache:
-        return llm_cache[key]
+    cached = llm_cache.get(key)
+    if cached is not None:
+        METRICS.inc("llm_cache_hits_total")
+        return cached
 
     # cache miss → call LLM
+    METRICS.inc("llm_cache_misses_total")
     result = llm_match(amazon_text, google_text)
 
-    llm_cache[key] = result
-    save_cache(llm_cache)
+    llm_cache[key] = result   # committed immediately, in its own transaction
 
     return result
\ No newline at end of file
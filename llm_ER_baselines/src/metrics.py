@@ -0,0 +1,204 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe run metrics: counters, gauges and latency observations,
+    each keyed by name plus optional labels (e.g. stage="verify").
+
+    Observations are kept raw and summarised at export time as
+    count / sum / mean / p50 / p95 / p99.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.observations = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.observations.setdefault(key, []).append(value)
+
+    def count(self, name, **labels):
+        with self._lock:
+            return self.counters.get(_key(name, labels), 0)
+
+    def total(self, name):
+        """Sum of a counter over all its label values."""
+        with self._lock:
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    @contextmanager
+    def span(self, stage):
+        """Times a pipeline stage into `stage_seconds{stage=...}`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def stage_seconds(self, stage):
+        return self.summary("stage_seconds", stage=stage)["sum"]
+
+    def summary(self, name, **labels) -> dict:
+        with self._lock:
+            values = np.asarray(self.observations.get(_key(name, labels), []), dtype=float)
+        if len(values) == 0:
+            return {"count": 0, "sum": 0.0}
+        out = {"count": int(len(values)), "sum": float(values.sum()), "mean": float(values.mean())}
+        for q, v in zip(QUANTILES, np.quantile(values, QUANTILES)):
+            out[f"p{int(q * 100)}"] = float(v)
+        return out
+
+    # ----------------------------------
+    # Export
+    # ----------------------------------
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            observed = list(self.observations)
+
+        def rows(items, field):
+            return [{"name": n, "labels": dict(l), field: v} for (n, l), v in items]
+
+        return {
+            "counters": rows(counters.items(), "value"),
+            "gauges": rows(gauges.items(), "value"),
+            "summaries": rows(
+                ((key, self.summary(key[0], **dict(key[1]))) for key in observed), "summary"
+            ),
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (observations as summaries)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            observed = sorted(self.observations)
+
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), value in gauges:
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, labels in observed:
+            header(name, "summary")
+            summary = self.summary(name, **dict(labels))
+            for q in QUANTILES:
+                if f"p{int(q * 100)}" in summary:
+                    quantile = _format_labels(labels, [("quantile", q)])
+                    lines.append(f"{name}{quantile} {summary[f'p{int(q * 100)}']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {summary['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {summary['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, prefix):
+        """Writes <prefix>.json and <prefix>.prom."""
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(prefix + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        with open(prefix + ".prom", "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+class Profiler:
+    """
+    Optional cProfile / tracemalloc hooks around a whole run.
+
+    `stop(prefix)` writes <prefix>.prof (load with pstats or snakeviz) and
+    <prefix>.mem.txt (top allocation sites), and records the traced peak
+    as the `tracemalloc_peak_bytes` gauge.
+    """
+
+    def __init__(self, cpu=False, memory=False, metrics=None):
+        self.cpu = cpu
+        self.memory = memory
+        self.metrics = metrics
+        self._profile = None
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self, prefix, top=20):
+        directory = os.path.dirname(prefix)
+        if directory and (self.cpu or self.memory):
+            os.makedirs(directory, exist_ok=True)
+
+        if self._profile is not None:
+            self._profile.disable()
+
+        # snapshot before pstats output allocates anything
+        if self.memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            if self.metrics is not None:
+                self.metrics.set("tracemalloc_peak_bytes", peak)
+            with open(prefix + ".mem.txt", "w", encoding="utf-8") as f:
+                f.write(f"peak: {peak} bytes\n")
+                for stat in snapshot.statistics("lineno")[:top]:
+                    f.write(f"{stat}\n")
+
+        if self._profile is not None:
+            self._profile.dump_stats(prefix + ".prof")
+            pstats.Stats(self._profile).sort_stats("cumulative").print_stats(top)
+            self._profile = None
+
+
+# process-wide registry shared by the LLM helpers and the scripts
+METRICS = Metrics()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from .retrieval import DEFAULT_CHUNK_SIZE, top_k
+
+SHARDS_PER_WORKER = 4   # more shards than workers evens out skewed rows
+
+
+# ----------------------------------
+# Sharing CSR matrices with workers
+# ----------------------------------
+def share_csr(matrix, root, name):
+    """
+    Dumps the CSR arrays of `matrix` to .npy files under `root` so worker
+    processes can memory-map them instead of receiving a pickled copy.
+    Returns a small picklable spec for `open_csr`.
+    """
+    matrix = matrix.tocsr()
+    prefix = os.path.join(root, name)
+    np.save(prefix + ".data.npy", matrix.data)
+    np.save(prefix + ".indices.npy", matrix.indices)
+    np.save(prefix + ".indptr.npy", matrix.indptr)
+    return {"prefix": prefix, "shape": matrix.shape}
+
+
+def open_csr(spec):
+    prefix = spec["prefix"]
+    return sp.csr_matrix(
+        (
+            np.load(prefix + ".data.npy", mmap_mode="r"),
+            np.load(prefix + ".indices.npy", mmap_mode="r"),
+            np.load(prefix + ".indptr.npy", mmap_mode="r"),
+        ),
+        shape=spec["shape"],
+        copy=False
+    )
+
+
+def shard_bounds(n_rows, n_shards):
+    """Contiguous [start, stop) row ranges covering 0..n_rows in order."""
+    edges = np.linspace(0, n_rows, max(1, n_shards) + 1).astype(int)
+    return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+# ----------------------------------
+# Sharded exact top-k
+# ----------------------------------
+def _top_k_shard(args):
+    query_spec, index_spec, start, stop, k, chunk_size = args
+    queries = open_csr(query_spec)[start:stop]
+    return top_k(queries, open_csr(index_spec), k, chunk_size=chunk_size)
+
+
+def parallel_top_k(query_matrix, index_matrix, k, n_workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    `retrieval.top_k` with the queries sharded over a process pool.
+
+    Both matrices are shared through memory-mapped files; shards are
+    contiguous query ranges and are concatenated in order, so the output
+    is identical to the single-process version.
+    """
+    n_workers = n_workers or os.cpu_count()
+    n_queries = query_matrix.shape[0]
+
+    with tempfile.TemporaryDirectory(prefix="er_shards_") as root:
+        query_spec = share_csr(query_matrix, root, "queries")
+        index_spec = share_csr(index_matrix, root, "index")
+
+        tasks = [
+            (query_spec, index_spec, start, stop, k, chunk_size)
+            for start, stop in shard_bounds(n_queries, n_workers * SHARDS_PER_WORKER)
+        ]
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_top_k_shard, tasks))
+
+    if not results:
+        k = min(k, index_matrix.shape[0])
+        return np.empty((0, k), dtype=np.int64), np.empty((0, k))
+
+    indices, scores = zip(*results)
+    return np.concatenate(indices), np.concatenate(scores)
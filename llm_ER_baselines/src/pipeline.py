@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from .metrics import METRICS
+
+PIPELINE_DIR = os.path.join("artifacts", "pipeline")
+
+
+def digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# ----------------------------------
+# Artifact formats
+# ----------------------------------
+class PickleFormat:
+    """Default: the stage's return value, pickled."""
+
+    @staticmethod
+    def save(path, value):
+        with open(os.path.join(path, "value.pkl"), "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(os.path.join(path, "value.pkl"), "rb") as f:
+            return pickle.load(f)
+
+
+class DirectoryFormat:
+    """The stage writes its own files into its artifact directory; `loader(path)` reopens them."""
+
+    def __init__(self, loader):
+        self.loader = loader
+
+    def save(self, path, value):
+        pass
+
+    def load(self, path):
+        return self.loader(path)
+
+
+# ----------------------------------
+# Runner
+# ----------------------------------
+class StageContext:
+    """
+    Passed to every stage function.
+
+    path       - the stage's artifact directory (exists, may hold files
+                 from an interrupted run with the same key)
+    incomplete - set to a reason to use the result in this run without
+                 storing it, so the next run executes the stage again;
+                 stages downstream of it are not stored either
+    """
+
+    def __init__(self, name, key, path):
+        self.name = name
+        self.key = key
+        self.path = path
+        self.incomplete = None
+
+
+class Stage:
+    def __init__(self, name, fn, deps, config, fmt, version):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.config = config
+        self.fmt = fmt
+        self.version = version
+
+
+class Pipeline:
+    """
+    Named stages with content-addressed, memoized outputs.
+
+    A stage's key is a digest of its name, version, config and the keys of
+    the stages it depends on, and its output is stored in
+    <root>/<name>/<key>/. Keys are derived top-down without running
+    anything, so a stage whose artifact exists is loaded instead of run,
+    and an upstream stage is only touched when a missing artifact
+    downstream needs its output. Input files belong in a stage's config as
+    content digests (see `artifacts.file_digest`).
+
+    An artifact without meta.json (written last) is incomplete and ignored.
+    """
+
+    def __init__(self, root=PIPELINE_DIR, force=()):
+        self.root = root
+        self.force = set(force)
+        self.stages = {}
+        self.log = []   # (stage, "loaded" | "ran", seconds)
+        self._keys = {}
+        self._values = {}
+        self._incomplete = set()
+
+    def add(self, name, fn, deps=(), config=None, fmt=PickleFormat, version=1):
+        """`fn(ctx, *dep_values)`; `config` must be JSON-serializable and capture everything that changes the output."""
+        unknown = [d for d in deps if d not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages {unknown}")
+        self.stages[name] = Stage(name, fn, deps, config, fmt, version)
+
+    def key(self, name) -> str:
+        if name not in self._keys:
+            stage = self.stages[name]
+            self._keys[name] = digest(
+                name, stage.version, stage.config, [self.key(d) for d in stage.deps]
+            )
+        return self._keys[name]
+
+    def path(self, name) -> str:
+        return os.path.join(self.root, name, self.key(name))
+
+    def forced(self, name) -> bool:
+        """Forced stages and everything downstream of them re-run."""
+        return name in self.force or any(self.forced(d) for d in self.stages[name].deps)
+
+    def is_cached(self, name) -> bool:
+        return os.path.exists(os.path.join(self.path(name), "meta.json")) and not self.forced(name)
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+
+        stage = self.stages[name]
+        path = self.path(name)
+
+        if self.is_cached(name):
+            start = time.perf_counter()
+            value = stage.fmt.load(path)
+            self.log.append((name, "loaded", time.perf_counter() - start))
+        else:
+            inputs = [self.get(d) for d in stage.deps]
+            os.makedirs(path, exist_ok=True)
+            meta_path = os.path.join(path, "meta.json")
+            if os.path.exists(meta_path):   # forced: invalidate before re-running
+                os.remove(meta_path)
+
+            ctx = StageContext(name, self.key(name), path)
+            upstream = [d for d in stage.deps if d in self._incomplete]
+            if upstream:
+                ctx.incomplete = f"depends on incomplete {', '.join(upstream)}"
+            start = time.perf_counter()
+            with METRICS.span(name):
+                value = stage.fn(ctx, *inputs)
+            seconds = time.perf_counter() - start
+            self.log.append((name, "ran", seconds))
+
+            if ctx.incomplete is None:
+                stage.fmt.save(path, value)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({
+                        "stage": name,
+                        "key": self.key(name),
+                        "config": stage.config,
+                        "deps": {d: self.key(d) for d in stage.deps},
+                        "seconds": seconds,
+                        "created": time.time(),
+                    }, f, indent=2, default=repr)
+            else:
+                self._incomplete.add(name)
+                print(f"[{name}] not stored: {ctx.incomplete}")
+
+        self._values[name] = value
+        return value
+
+    def status(self) -> list:
+        """(stage, key, cached) in definition order."""
+        return [(name, self.key(name), self.is_cached(name)) for name in self.stages]
@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+
+# private RNG so retry jitter never perturbs the seeded global `random`
+_jitter = random.Random()
+
+
+class RateLimiter:
+    """
+    Thread-safe requests-per-minute / tokens-per-minute limiter.
+
+    Both budgets are token buckets that refill continuously over a 60 s
+    window. `acquire(tokens)` blocks until one request and `tokens` tokens
+    are available. A limit of None disables that bucket.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lock = threading.Lock()
+        self._requests = float(rpm) if rpm else 0.0
+        self._tokens = float(tpm) if tpm else 0.0
+        self._last = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    def acquire(self, tokens=0):
+        if self.tpm:
+            # a single request larger than the whole bucket would never fit
+            tokens = min(tokens, self.tpm)
+
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+
+                wait = 0.0
+                if self.rpm and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+
+                if wait == 0.0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= tokens
+                    return
+
+            time.sleep(wait)
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a call is known."""
+        if not self.tpm:
+            return
+        with self._lock:
+            self._tokens = min(self.tpm, self._tokens + estimated - actual)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, retry_after=None):
+    """Exponential backoff with full jitter; honours a server Retry-After."""
+    if retry_after is not None:
+        return min(cap, float(retry_after))
+    return _jitter.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for TPM admission."""
+    return max(1, len(text) // 4)
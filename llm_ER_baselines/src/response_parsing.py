@@ -0,0 +1,93 @@
+import json
+import re
+
+# Appended to the prompt when a response has to be re-requested
+STRICT_SUFFIX = "\n\nReturn ONLY the JSON object, with double-quoted keys and no text before or after it."
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+class VerificationError(ValueError):
+    """A response that could not be turned into a verdict; keeps the raw text."""
+
+    def __init__(self, message, raw=None):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _first_object(text):
+    """The first balanced {...} in `text` (string-aware), or None."""
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for i in range(start, len(text)):
+            c = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_json(content: str) -> dict:
+    """
+    json.loads, falling back to repairs for the usual model slips: code
+    fences, text around the object, curly quotes, trailing commas and
+    single-quoted keys / strings. Raises VerificationError (with the raw
+    content) if nothing parses to a JSON object.
+
+    >>> parse_json('{"label": "match", "confidence": 0.9}')
+    {'label': 'match', 'confidence': 0.9}
+    >>> parse_json('```json\\n{"label": "no_match", "confidence": 0.7}\\n```')
+    {'label': 'no_match', 'confidence': 0.7}
+    >>> parse_json('Sure! Here it is: {"label": "match"} Hope that helps.')
+    {'label': 'match'}
+    >>> parse_json('{\u201clabel\u201d: \u201cmatch\u201d}')
+    {'label': 'match'}
+    >>> parse_json('{"label": "match", "evidence": ["model number",],}')
+    {'label': 'match', 'evidence': ['model number']}
+    >>> parse_json("{'label': 'no_match', 'confidence': 0.8,}")
+    {'label': 'no_match', 'confidence': 0.8}
+    >>> try:
+    ...     parse_json('I cannot decide.')
+    ... except VerificationError as e:
+    ...     print(e.raw)
+    I cannot decide.
+    """
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
+    text = _FENCE_RE.sub("", content.strip()).translate(_SMART_QUOTES)
+    candidate = _first_object(text)
+    if candidate is not None:
+        candidate = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+        attempts = [candidate]
+        if '"' not in candidate:
+            attempts.append(candidate.replace("'", '"'))
+        for attempt in attempts:
+            try:
+                parsed = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+
+    raise VerificationError(f"LLM returned invalid JSON:\n{content}", raw=content)
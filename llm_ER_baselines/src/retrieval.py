@@ -0,0 +1,101 @@
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def top_k_chunk(query_chunk, index_matrix, k):
+    """
+    Exact top-k for one block of queries.
+
+    Rows of both matrices are expected to be L2-normalized (TfidfVectorizer
+    default), so the sparse dot product is the cosine similarity.
+    """
+    scores = (query_chunk @ index_matrix.T).toarray()
+    n_rows, n_cols = scores.shape
+    k = min(k, n_cols)
+
+    if k < n_cols:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(n_cols), (n_rows, 1))
+
+    part_scores = np.take_along_axis(scores, part, axis=1)
+
+    # order the k survivors: score desc, index asc on ties
+    order = np.lexsort((part, -part_scores), axis=1)
+    top_idx = np.take_along_axis(part, order, axis=1)
+    top_scores = np.take_along_axis(part_scores, order, axis=1)
+
+    return top_idx, top_scores
+
+
+def top_k(query_matrix, index_matrix, k, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Top-k cosine neighbours in `index_matrix` for every row of `query_matrix`.
+
+    Queries are scored in blocks of `chunk_size` rows, so peak memory is
+    O(chunk_size * n_index) regardless of the number of queries.
+
+    Returns (indices, scores), both shaped (n_queries, min(k, n_index)).
+    """
+    query_matrix = query_matrix.tocsr()
+    index_matrix = index_matrix.tocsr()
+
+    n_queries = query_matrix.shape[0]
+    k = min(k, index_matrix.shape[0])
+
+    indices = np.empty((n_queries, k), dtype=np.int64)
+    scores = np.empty((n_queries, k), dtype=np.float64)
+
+    for start in range(0, n_queries, chunk_size):
+        stop = min(start + chunk_size, n_queries)
+        indices[start:stop], scores[start:stop] = top_k_chunk(
+            query_matrix[start:stop], index_matrix, k
+        )
+
+    return indices, scores
+
+
+def rerank_candidates(query_matrix, index_matrix, candidate_lists, k):
+    """
+    Exact cosine top-k restricted to a per-query candidate set (e.g. block
+    index postings or ANN buckets).
+
+    Returns (indices, scores) shaped (n_queries, k); rows with fewer than k
+    candidates are padded with index -1 and score NaN.
+    """
+    query_matrix = query_matrix.tocsr()
+    index_matrix = index_matrix.tocsr()
+
+    n_queries = query_matrix.shape[0]
+    indices = np.full((n_queries, k), -1, dtype=np.int64)
+    scores = np.full((n_queries, k), np.nan)
+
+    for i, cands in enumerate(candidate_lists):
+        if len(cands) == 0:
+            continue
+
+        cands = np.asarray(cands)
+        cand_scores = (index_matrix[cands] @ query_matrix[i].T).toarray().ravel()
+
+        order = np.lexsort((cands, -cand_scores))[:k]
+        indices[i, :len(order)] = cands[order]
+        scores[i, :len(order)] = cand_scores[order]
+
+    return indices, scores
+
+
+def flatten_top_k(indices, scores):
+    """
+    (n_queries, k) top-k arrays -> flat candidate columns
+    (query_idx, index_idx, rank, score), dropping -1 padding.
+    """
+    n_queries, k = indices.shape
+    valid = indices.ravel() >= 0
+
+    return (
+        np.repeat(np.arange(n_queries), k)[valid],
+        indices.ravel()[valid],
+        np.tile(np.arange(1, k + 1), n_queries)[valid],
+        scores.ravel()[valid],
+    )
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+from .constants import HIGH_CONF, LOW_CONF
+
+
+def _tie_ends(sorted_scores):
+    """Last position of every run of equal values in a sorted array."""
+    n = len(sorted_scores)
+    return np.flatnonzero(np.r_[sorted_scores[1:] != sorted_scores[:-1], True]) if n else np.empty(0, int)
+
+
+class ScoreCalibration:
+    """
+    Maps a TF-IDF score to gating thresholds and a match probability.
+
+    low / high  - reject at or below `low`, accept at or above `high`
+    boundary    - score where a match becomes more likely than not
+    rates       - monotone per-bin match rate over [0, 1], used as P(match | score)
+    fitted      - True if fitted on labelled pairs; the rates of `default`
+                  are a guess and not an estimate of anything
+    """
+
+    def __init__(self, low, boundary, high, rates, fitted=False):
+        self.low = low
+        self.boundary = boundary
+        self.high = high
+        self.rates = np.asarray(rates, dtype=float)
+        self.fitted = fitted
+
+    @classmethod
+    def default(cls, low=LOW_CONF, high=HIGH_CONF, n_bins=20):
+        """Uncalibrated: the fixed gates, probability ramping linearly between them."""
+        centers = (np.arange(n_bins) + 0.5) / n_bins
+        rates = np.clip((centers - low) / (high - low), 0.0, 1.0)
+        return cls(low, (low + high) / 2, high, rates)
+
+    @classmethod
+    def fit(cls, scores, labels, target_precision=0.98, max_miss_rate=0.01, n_bins=20):
+        """
+        Calibrates from a labelled sample of candidate pairs (labels 1 = match).
+
+        high     - lowest score whose accepted set (score >= high) still has
+                   precision >= `target_precision`
+        low      - highest score whose rejected set (score <= low) holds at
+                   most `max_miss_rate` of the sample's matches
+        boundary - F1-optimal single threshold on the sample
+        """
+        scores = np.asarray(scores, dtype=float)
+        labels = np.asarray(labels, dtype=int)
+        n_pos = labels.sum()
+
+        # accepted set above each threshold, highest score first
+        order = np.argsort(-scores, kind="stable")
+        s, y = scores[order], labels[order]
+        ends = _tie_ends(-s)
+        tp = np.cumsum(y)[ends]
+        accepted = ends + 1
+        precision = tp / accepted
+        recall = tp / max(n_pos, 1)
+        f1 = np.where(tp > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-12), 0.0)
+
+        ok = np.flatnonzero(precision >= target_precision)
+        high = float(s[ends[ok[-1]]]) if len(ok) else float("inf")
+        boundary = float(s[ends[np.argmax(f1)]]) if len(ends) else (LOW_CONF + HIGH_CONF) / 2
+
+        # rejected set below each threshold, lowest score first
+        order = np.argsort(scores, kind="stable")
+        s, y = scores[order], labels[order]
+        ends = _tie_ends(s)
+        missed = np.cumsum(y)[ends]
+        ok = np.flatnonzero(missed <= max_miss_rate * n_pos)
+        low = float(s[ends[ok[-1]]]) if len(ok) else float("-inf")
+        low = min(low, boundary)
+        high = max(high, boundary)
+
+        # Laplace-smoothed bin rates, forced non-decreasing in score
+        bins = np.clip((scores * n_bins).astype(int), 0, n_bins - 1)
+        counts = np.bincount(bins, minlength=n_bins)
+        matches = np.bincount(bins, weights=labels, minlength=n_bins)
+        rates = np.maximum.accumulate((matches + 0.5) / (counts + 1.0))
+
+        return cls(low, boundary, high, rates, fitted=True)
+
+    def match_probability(self, scores) -> np.ndarray:
+        n_bins = len(self.rates)
+        bins = np.clip((np.asarray(scores, dtype=float) * n_bins).astype(int), 0, n_bins - 1)
+        return self.rates[bins]
+
+
+class BudgetScheduler:
+    """
+    Spends a fixed LLM budget on the uncertain pairs that are worth most.
+
+    Pairs are dispatched in waves. Before each wave the remaining pairs are
+    ranked by how close their match probability is to 0.5 (nearest the
+    decision boundary first), plus `unmatched_bonus` for Amazon records
+    that have no confident match yet; cached pairs cost nothing and go
+    first. A wave is filled greedily in that order with the pairs the
+    remaining budget can still pay for, skipping any that do not fit, using
+    `cost_fn(pair) -> (calls, tokens)` estimates; spend is then charged from
+    the actual counters in `metrics`. The run stops when no remaining pair
+    fits, and those pairs get the calibrated fallback label (match iff
+    score >= boundary).
+    """
+
+    def __init__(self, calibration, max_calls=None, max_tokens=None,
+                 wave_size=256, unmatched_bonus=0.25, metrics=None):
+        self.calibration = calibration
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.wave_size = wave_size
+        self.unmatched_bonus = unmatched_bonus
+        self.metrics = metrics
+
+    def _spent(self):
+        if self.metrics is None:
+            return 0, 0
+        tokens = (self.metrics.total("llm_prompt_tokens_total")
+                  + self.metrics.total("llm_completion_tokens_total"))
+        return self.metrics.total("llm_calls_total"), tokens
+
+    def _affordable(self, order, costs, calls_left, tokens_left):
+        """
+        Walks `order` taking every pair whose (calls, tokens) cost still fits
+        in what is left, up to `wave_size`. Returns (wave, unaffordable) as
+        arrays of pair indices; pairs after the wave is full are in neither.
+        """
+        if calls_left is None and tokens_left is None:
+            return order[:self.wave_size], order[:0]
+
+        wave, unaffordable = [], []
+        for i in order.tolist():
+            if len(wave) == self.wave_size:
+                break
+            c, t = costs[i]
+            if (calls_left is not None and c > calls_left) or (tokens_left is not None and t > tokens_left):
+                unaffordable.append(i)
+                continue
+            wave.append(i)
+            if calls_left is not None:
+                calls_left -= c
+            if tokens_left is not None:
+                tokens_left -= t
+        return np.array(wave, dtype=np.int64), np.array(unaffordable, dtype=np.int64)
+
+    def run(self, scores, amazon_ids, pairs, verify_fn, cost_fn, confident_amazon=()):
+        """
+        scores / amazon_ids / pairs - aligned per uncertain pair
+        verify_fn(pairs) -> outputs (same order, `call_llm` schema)
+        confident_amazon            - Amazon ids already matched by the gate
+
+        Returns (outputs, report): outputs[i] is the verdict for pair i, or
+        None if it was skipped for budget (or `verify_fn` returned None for it).
+        """
+        scores = np.asarray(scores, dtype=float)
+        amazon_codes, amazon_uniques = pd.factorize(pd.Series(amazon_ids, dtype=object))
+        prob = self.calibration.match_probability(scores)
+        base_priority = 1.0 - 2.0 * np.abs(prob - 0.5)
+
+        costs = np.array([cost_fn(p) for p in pairs], dtype=np.int64).reshape(-1, 2)
+        free = (costs == 0).all(axis=1)
+        costs = costs.tolist()
+
+        matched = pd.Index(amazon_uniques).isin(list(confident_amazon))
+        outputs = [None] * len(pairs)
+        remaining = np.arange(len(pairs))
+        start_calls, start_tokens = self._spent()
+
+        while len(remaining):
+            calls, tokens = self._spent()
+            calls_left = None if self.max_calls is None else self.max_calls - (calls - start_calls)
+            tokens_left = None if self.max_tokens is None else self.max_tokens - (tokens - start_tokens)
+
+            unmatched = ~matched[amazon_codes[remaining]]
+            priority = base_priority[remaining] + self.unmatched_bonus * unmatched
+            # free (cached) pairs first, then by priority; stable on file order
+            order = remaining[np.lexsort((-priority, ~free[remaining]))]
+
+            wave, unaffordable = self._affordable(order, costs, calls_left, tokens_left)
+            # the budget only shrinks, so a pair that does not fit now never will
+            remaining = np.setdiff1d(remaining, unaffordable, assume_unique=True)
+            if len(wave) == 0:
+                break
+
+            for i, out in zip(wave, verify_fn([pairs[i] for i in wave])):
+                outputs[i] = out
+                if out is not None and out["label"] == "match":
+                    matched[amazon_codes[i]] = True
+
+            remaining = np.setdiff1d(remaining, wave, assume_unique=True)
+
+        return outputs, self._report(outputs, prob, scores, start_calls, start_tokens)
+
+    def fallback_label(self, score):
+        return "match" if score >= self.calibration.boundary else "no_match"
+
+    def _report(self, outputs, prob, scores, start_calls, start_tokens):
+        skipped = np.array([out is None for out in outputs], dtype=bool)
+        fallback_no = skipped & (scores < self.calibration.boundary)
+        fallback_yes = skipped & ~fallback_no
+        calls, tokens = self._spent()
+
+        return {
+            "verified": int((~skipped).sum()),
+            "skipped": int(skipped.sum()),
+            "calls": calls - start_calls,
+            "tokens": tokens - start_tokens,
+            # expected true matches the fallback labels as no_match, and
+            # expected false matches it accepts
+            "expected_missed_matches": float(prob[fallback_no].sum()),
+            "expected_false_matches": float((1 - prob[fallback_yes]).sum()),
+        }
@@ -1,5 +1,7 @@
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+
+from .parallel import parallel_aligned_scores
+from .scoring import aligned_cosine
 
 vectorizer = TfidfVectorizer(
                         lowercase=True,
@@ -15,8 +17,20 @@ def calculate_similiarity(pairs_df, compare_column1, compare_column2):
     )
 
     n = len(pairs_df)
-    pairs_df["similarity"] = cosine_similarity(
-        tfidf[:n], tfidf[n:]
-    ).diagonal()
+    pairs_df["similarity"] = aligned_cosine(tfidf[:n], tfidf[n:])
+
+    return pairs_df
+
+def calculate_similiarity_parallel(pairs_df, compare_column1, compare_column2, n_workers=None):
+    """`calculate_similiarity` with the pair scoring sharded over processes."""
+    tfidf = vectorizer.fit_transform(
+        pairs_df[compare_column1].tolist() +
+        pairs_df[compare_column2].tolist()
+    )
+
+    n = len(pairs_df)
+    pairs_df["similarity"] = parallel_aligned_scores(
+        tfidf[:n], tfidf[n:], n_workers=n_workers
+    )
 
-    return pairs_df
\ No newline at end of file
+    return pairs_df
@@ -1,5 +1,13 @@
+import numpy as np
+import pandas as pd
+
 from .constants import *
 
+def _safe_div(num, den):
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
 def compute_metrics(pairs_df, gold_pairs, threshold):
     pairs_df["prediction"] = (pairs_df["similarity"] >= threshold).astype(int)
     pred_df = pairs_df[pairs_df["prediction"] == 1]
@@ -9,8 +17,61 @@ def compute_metrics(pairs_df, gold_pairs, threshold):
     FP = len(pred_pairs - gold_pairs)
     FN = len(gold_pairs - pred_pairs)
 
-    precision = TP / (TP + FP)  
-    recall = TP / (TP + FN)
-    f1 = 2 * precision * recall / (precision + recall)
+    precision = TP / (TP + FP) if TP + FP > 0 else 0
+    recall = TP / (TP + FN) if TP + FN > 0 else 0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0
+
+    return precision, recall, f1
+
+def precision_recall_curve(pairs_df, gold_pairs, thresholds=None):
+    """
+    Precision / recall / F1 at many thresholds from a single sort.
+
+    Same definitions as `compute_metrics`: a pair is predicted at threshold
+    t when its similarity is >= t, duplicate pairs count once, and gold
+    pairs that never appear in `pairs_df` count as false negatives. Each
+    pair is labelled once, pairs are sorted by similarity once, and the
+    counts at every threshold are read off cumulative sums.
+
+    `thresholds=None` evaluates every distinct similarity value. Metrics
+    with an empty denominator are 0 instead of raising.
+    """
+    key = [AMAZON_ID_COL, GOOGLE_ID_COL]
+
+    # a duplicated pair is predicted as soon as any of its rows is
+    scores = pairs_df.groupby(key, sort=False)["similarity"].max().reset_index()
+
+    gold_df = pd.DataFrame(list(gold_pairs), columns=key)
+    gold_df["is_gold"] = True
+    labelled = scores.merge(gold_df, on=key, how="left")
+    is_gold = labelled["is_gold"].notna().to_numpy()
+
+    similarity = labelled["similarity"].to_numpy(dtype=float)
+    order = np.argsort(-similarity, kind="stable")
+    tp_cum = np.concatenate([[0], np.cumsum(is_gold[order])])
+
+    if thresholds is None:
+        thresholds = np.unique(similarity)[::-1]
+    thresholds = np.asarray(thresholds, dtype=float)
+
+    # number of pairs with similarity >= t
+    ascending = np.sort(similarity)
+    n_pred = len(ascending) - np.searchsorted(ascending, thresholds, side="left")
+
+    tp = tp_cum[n_pred]
+    fp = n_pred - tp
+    fn = len(gold_pairs) - tp
+
+    precision = _safe_div(tp, tp + fp)
+    recall = _safe_div(tp, tp + fn)
+    f1 = _safe_div(2 * precision * recall, precision + recall)
 
-    return precision, recall, f1
\ No newline at end of file
+    return pd.DataFrame({
+        "threshold": thresholds,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+    })
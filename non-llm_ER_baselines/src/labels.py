@@ -1,47 +1,129 @@
 # %%
+import numpy as np
 import pandas as pd
-import random
-
 from .constants import AMAZON_ID_COL, GOOGLE_ID_COL
 
+SEED = 42
+PAIR_KEY = [AMAZON_ID_COL, GOOGLE_ID_COL]
+
 # %%
 def generate_positive_pairs(gt):
     positive_pairs = gt.copy()
     positive_pairs["label"] = 1
     return positive_pairs
 
-def generate_negative_pairs(gt_map, all_google_ids, k=3):
-    negatives = []
+def _sample_negatives(gt_map, google_ids, want, rng):
+    """
+    Draws `want[i]` distinct negatives for the i-th Amazon id of `gt_map` by
+    rejection sampling over integer-encoded Google ids: draw codes uniformly,
+    redraw only the ones that hit a known pair or repeat a draw for the same
+    Amazon id. Returns (amazon_pos, google_code) arrays.
+    """
+    n_google = len(google_ids)
+    code_of = pd.Index(google_ids)
 
-    for amazon_id, true_google_ids in gt_map.items():
-        candidates = list(set(all_google_ids) - true_google_ids)
+    # known pairs (positives + anything already picked) as a*n_google + g
+    excluded = [np.asarray(list(s), dtype=object) for s in gt_map.values()]
+    ex_a = np.repeat(np.arange(len(excluded)), [len(s) for s in excluded])
+    ex_g = code_of.get_indexer(np.concatenate(excluded)) if len(ex_a) else ex_a
+    known = ex_g >= 0
+    excluded_keys = np.unique(ex_a[known] * n_google + ex_g[known])
 
-        sampled = random.sample(
-            candidates,
-            min(k, len(candidates))
-        )
+    available = n_google - np.bincount(ex_a[known], minlength=len(excluded))
+    want = np.minimum(want, available)
+
+    rows = np.repeat(np.arange(len(excluded)), want)
+    draws = np.empty(len(rows), dtype=np.int64)
+    pending = np.arange(len(rows))
+
+    while pending.size:
+        draws[pending] = rng.integers(n_google, size=pending.size)
+        keys = rows * n_google + draws
+        rejected = np.isin(keys, excluded_keys) | pd.Series(keys).duplicated().to_numpy()
+        pending = np.flatnonzero(rejected)
+
+    return rows, draws
+
+def generate_negative_pairs(gt_map, all_google_ids, k=3, seed=SEED):
+    """
+    Up to `k` random non-matching Google ids per Amazon id of `gt_map`
+    (amazon id -> set of matching google ids). Same seed, same pairs.
+    """
+    rng = np.random.default_rng(seed)
+    google_ids = pd.unique(pd.Series(all_google_ids, dtype=object)).astype(object)
+    amazon_ids = np.asarray(list(gt_map), dtype=object)
+
+    rows, draws = _sample_negatives(
+        gt_map, google_ids, np.full(len(amazon_ids), k), rng
+    )
 
-        for google_id in sampled:
-            negatives.append({
-                AMAZON_ID_COL: amazon_id,
-                GOOGLE_ID_COL: google_id,
-                "label": 0
-            })
+    return pd.DataFrame({
+        AMAZON_ID_COL: amazon_ids[rows],
+        GOOGLE_ID_COL: google_ids[draws],
+        "label": 0
+    })
 
-    return pd.DataFrame(negatives)
+def generate_hard_negative_pairs(gt_df, candidates_df, k=3, rank_col="rank"):
+    """
+    The `k` best-ranked retrieved candidates per Amazon id of `gt_df` that
+    are not ground-truth matches (e.g. CandidateStore.frame() or the TF-IDF
+    top-k). These are the near misses a matcher actually has to reject.
+    """
+    gt_amazon = gt_df[AMAZON_ID_COL].unique()
+    candidates = candidates_df.loc[
+        candidates_df[AMAZON_ID_COL].isin(gt_amazon), PAIR_KEY + [rank_col]
+    ]
 
-def generate_gold_df(gt_df, all_google_ids):
+    candidates = candidates.merge(
+        gt_df[PAIR_KEY].drop_duplicates(), on=PAIR_KEY, how="left", indicator=True
+    )
+    negatives = (
+        candidates[candidates["_merge"] == "left_only"]
+        .sort_values([AMAZON_ID_COL, rank_col], kind="stable")
+        .drop_duplicates(PAIR_KEY)
+        .groupby(AMAZON_ID_COL, sort=False)
+        .head(k)
+    )
+
+    return negatives[PAIR_KEY].assign(label=0).reset_index(drop=True)
+
+def generate_gold_df(gt_df, all_google_ids, k=3, seed=SEED, candidates_df=None):
+    """
+    Ground-truth positives plus `k` negatives per Amazon id. Negatives are
+    random by default; with `candidates_df` they are hard negatives from the
+    retriever, topped up with random ones where it returned fewer than `k`.
+    """
     gt_map = (
         gt_df.groupby(AMAZON_ID_COL)[GOOGLE_ID_COL]
         .apply(set)
         .to_dict()
     )
     positive_pairs = generate_positive_pairs(gt_df)
-    negative_pairs = generate_negative_pairs(gt_map,all_google_ids)
+
+    if candidates_df is None:
+        negative_pairs = generate_negative_pairs(gt_map, all_google_ids, k, seed)
+    else:
+        hard = generate_hard_negative_pairs(gt_df, candidates_df, k)
+        picked = hard.groupby(AMAZON_ID_COL)[GOOGLE_ID_COL].apply(set).to_dict()
+        excluded = {a: g | picked.get(a, set()) for a, g in gt_map.items()}
+
+        google_ids = pd.unique(pd.Series(all_google_ids, dtype=object)).astype(object)
+        amazon_ids = np.asarray(list(excluded), dtype=object)
+        want = k - np.array([len(picked.get(a, ())) for a in amazon_ids], dtype=np.int64)
+
+        rows, draws = _sample_negatives(
+            excluded, google_ids, want, np.random.default_rng(seed)
+        )
+        top_up = pd.DataFrame({
+            AMAZON_ID_COL: amazon_ids[rows],
+            GOOGLE_ID_COL: google_ids[draws],
+            "label": 0
+        })
+        negative_pairs = pd.concat([hard, top_up], ignore_index=True)
 
     gold_df = pd.concat(
         [positive_pairs, negative_pairs],
         ignore_index=True
     )
 
-    return gold_df
\ No newline at end of file
+    return gold_df
@@ -0,0 +1,81 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+from .scoring import aligned_cosine
+
+SHARDS_PER_WORKER = 4   # more shards than workers evens out skewed rows
+
+
+# ----------------------------------
+# Sharing CSR matrices with workers
+# ----------------------------------
+def share_csr(matrix, root, name):
+    """
+    Dumps the CSR arrays of `matrix` to .npy files under `root` so worker
+    processes can memory-map them instead of receiving a pickled copy.
+    Returns a small picklable spec for `open_csr`.
+    """
+    matrix = matrix.tocsr()
+    prefix = os.path.join(root, name)
+    np.save(prefix + ".data.npy", matrix.data)
+    np.save(prefix + ".indices.npy", matrix.indices)
+    np.save(prefix + ".indptr.npy", matrix.indptr)
+    return {"prefix": prefix, "shape": matrix.shape}
+
+
+def open_csr(spec):
+    prefix = spec["prefix"]
+    return sp.csr_matrix(
+        (
+            np.load(prefix + ".data.npy", mmap_mode="r"),
+            np.load(prefix + ".indices.npy", mmap_mode="r"),
+            np.load(prefix + ".indptr.npy", mmap_mode="r"),
+        ),
+        shape=spec["shape"],
+        copy=False
+    )
+
+
+def shard_bounds(n_rows, n_shards):
+    """Contiguous [start, stop) row ranges covering 0..n_rows in order."""
+    edges = np.linspace(0, n_rows, max(1, n_shards) + 1).astype(int)
+    return [(a, b) for a, b in zip(edges[:-1], edges[1:]) if b > a]
+
+
+# ----------------------------------
+# Sharded aligned-pair scoring
+# ----------------------------------
+def _aligned_shard(args):
+    left_spec, right_spec, start, stop = args
+    left = open_csr(left_spec)[start:stop]
+    right = open_csr(right_spec)[start:stop]
+    return aligned_cosine(left, right)
+
+
+def parallel_aligned_scores(left, right, n_workers=None):
+    """
+    Row-wise dot products left[i] . right[i] over a process pool.
+
+    Rows must be L2-normalized (TfidfVectorizer default) for the result to
+    be the cosine similarity. Shards are contiguous and concatenated in
+    order, so the output does not depend on the number of workers.
+    """
+    n_workers = n_workers or os.cpu_count()
+
+    with tempfile.TemporaryDirectory(prefix="er_shards_") as root:
+        left_spec = share_csr(left, root, "left")
+        right_spec = share_csr(right, root, "right")
+
+        tasks = [
+            (left_spec, right_spec, start, stop)
+            for start, stop in shard_bounds(left.shape[0], n_workers * SHARDS_PER_WORKER)
+        ]
+
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(_aligned_shard, tasks))
+
+    return np.concatenate(results) if results else np.empty(0)
@@ -0,0 +1,49 @@
+from itertools import islice
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def aligned_cosine(left, right, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Cosine similarity of each aligned row pair left[i], right[i].
+
+    Rows must be L2-normalized (TfidfVectorizer default), so the cosine is
+    the row-wise dot product. Work is done `chunk_size` rows at a time:
+    O(nnz) time and O(chunk_size) extra memory, instead of the n x n
+    matrix `cosine_similarity(left, right).diagonal()` builds.
+    """
+    left = left.tocsr()
+    right = right.tocsr()
+
+    n = left.shape[0]
+    scores = np.empty(n, dtype=np.float64)
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        product = left[start:stop].multiply(right[start:stop])
+        scores[start:stop] = np.asarray(product.sum(axis=1)).ravel()
+
+    return scores
+
+
+def stream_similarity(pairs, vectorizer, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Scores an iterator of (left_text, right_text) pairs of any length.
+
+    `vectorizer` must already be fitted (on the catalog or a sample of it)
+    so every chunk is weighted with the same IDF. Yields one score array
+    per chunk of up to `chunk_size` pairs, in input order.
+    """
+    pairs = iter(pairs)
+
+    while True:
+        chunk = list(islice(pairs, chunk_size))
+        if not chunk:
+            return
+
+        left, right = zip(*chunk)
+        yield aligned_cosine(
+            vectorizer.transform(left), vectorizer.transform(right), chunk_size
+        )